@@ -0,0 +1,484 @@
+# Copyright (C) 2017  Patrick Totzke <patricktotzke@gmail.com>
+# This file is released under the GNU GPL, version 3 or a later revision.
+
+import numpy as np
+
+
+def segments(ptr, vs):
+    """
+    indices of the CSR entries of all vertices in `vs`, concatenated, and the
+    offsets at which each vertex's segment starts
+    """
+    lens = ptr[vs + 1] - ptr[vs]
+    starts = np.cumsum(lens) - lens
+    idx = np.repeat(ptr[vs] - starts, lens) + np.arange(lens.sum())
+    return idx, starts
+
+
+def indexer(nodes):
+    """
+    a function that maps an array of node ids to their positions in `nodes`
+    and raises a `ValueError` for ids that do not occur there
+    """
+    nodes = np.asarray(nodes, dtype=np.int64)
+
+    # nodes are very often numbered consecutively from zero
+    identity = np.array_equal(nodes, np.arange(len(nodes)))
+    if not identity:
+        order = np.argsort(nodes, kind='stable')
+        ids = nodes[order]
+
+    def index_of(vs):
+        vs = np.asarray(vs, dtype=np.int64)
+        if identity:
+            pos = vs.copy()
+            missing = (vs < 0) | (vs >= len(nodes))
+        else:
+            pos = np.searchsorted(ids, vs)
+            pos[pos == len(ids)] = 0
+            missing = ids[pos] != vs if len(ids) else vs == vs
+        if missing.any():
+            raise ValueError("edge refers to unknown node %d"
+                             % vs[missing][0])
+        return pos if identity else order[pos]
+    return index_of
+
+
+class Arena(object):
+    """
+    Compact, array-backed game graph.
+
+    Vertices are indexed 0..n-1; `nodes` maps these indices back to the
+    node ids of the game graph they were built from. Edges are stored in
+    compressed sparse row (CSR) form: the successors of vertex `i` are
+    `succ[succ_ptr[i]:succ_ptr[i+1]]`, in the order in which the edges were
+    added to the original graph. The predecessor arrays `pred_ptr`/`pred`
+    are the CSR form of the reversed graph, and `pred_edge` holds, for every
+    entry in `pred`, the index of the corresponding edge in `succ`.
+    """
+
+    def __init__(self, nodes, owner, succ_ptr, succ):
+        self.nodes = np.asarray(nodes, dtype=np.int64)
+        self.owner = np.asarray(owner, dtype=np.int8)
+        self.succ_ptr = np.asarray(succ_ptr, dtype=np.int64)
+        self.succ = np.asarray(succ, dtype=np.int64)
+
+        # source vertex of each edge and the reversed (predecessor) CSR
+        n = len(self.nodes)
+        self.src = np.repeat(np.arange(n, dtype=np.int64),
+                             np.diff(self.succ_ptr))
+        self.pred_edge = np.argsort(self.succ, kind='stable')
+        self.pred = self.src[self.pred_edge]
+        self.pred_ptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.succ, minlength=n), out=self.pred_ptr[1:])
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+    def number_of_edges(self):
+        return len(self.succ)
+
+    def out_degree(self):
+        return np.diff(self.succ_ptr)
+
+    def index(self):
+        """ map from node ids to vertex indices """
+        return {v: i for i, v in enumerate(self.nodes.tolist())}
+
+    def playernodes(self, player):
+        return np.flatnonzero(self.owner == player)
+
+    def reachable(self, vs, backward=False):
+        """
+        the set of vertices reachable from (or, if `backward` is set, those
+        that can reach) any of the vertices `vs`, as a boolean mask
+        """
+        if backward:
+            ptr, adj = self.pred_ptr, self.pred
+        else:
+            ptr, adj = self.succ_ptr, self.succ
+        seen = np.zeros(len(self), dtype=np.bool_)
+        frontier = np.unique(np.asarray(vs, dtype=np.int64))
+        seen[frontier] = True
+        while len(frontier):
+            idx, _ = segments(ptr, frontier)
+            frontier = np.unique(adj[idx])
+            frontier = frontier[~seen[frontier]]
+            seen[frontier] = True
+        return seen
+
+    def attractor(self, player, target, within=None, strategy=None):
+        """
+        the attractor of `player` to the vertices in `target`, a boolean
+        mask: all vertices from which `player` can force a visit to
+        `target`, playing in the subgame induced by the mask `within`.
+
+        Vertices of the opponent are attracted once their last successor
+        in the subgame is, which is tracked with a counter per vertex. If
+        `strategy` is given, the successor that every attracted vertex of
+        `player` moves to is stored in it.
+        """
+        n = len(self)
+        if within is None:
+            within = np.ones(n, dtype=np.bool_)
+        inside = within[self.src] & within[self.succ]
+        count = np.bincount(self.src[inside], minlength=n)
+        mine = self.owner == player
+
+        attr = np.zeros(n, dtype=np.bool_)
+        frontier = np.flatnonzero(np.asarray(target) & within)
+        attr[frontier] = True
+        while len(frontier):
+            idx, _ = segments(self.pred_ptr, frontier)
+            us, ts = self.pred[idx], self.succ[self.pred_edge[idx]]
+            keep = within[us] & ~attr[us]
+            us, ts = us[keep], ts[keep]
+
+            # vertices of the player need only one edge into the attractor
+            ours = mine[us]
+            won, first = np.unique(us[ours], return_index=True)
+            if strategy is not None:
+                strategy[won] = ts[ours][first]
+
+            # those of the opponent need all of them
+            theirs, hits = np.unique(us[~ours], return_counts=True)
+            count[theirs] -= hits
+            frontier = np.concatenate([won, theirs[count[theirs] == 0]])
+            attr[frontier] = True
+        return attr
+
+    def components(self):
+        """
+        label the strongly connected components (Tarjan's algorithm).
+
+        Labels are assigned in reverse topological order, that is, edges only
+        ever lead into components with the same or a smaller label.
+        """
+        n = len(self)
+        succ, ptr = self.succ.tolist(), self.succ_ptr.tolist()
+        index = [-1] * n
+        low = [0] * n
+        onstack = [False] * n
+        comp = [-1] * n
+        stack = []
+        counter = label = 0
+
+        for root in range(n):
+            if index[root] >= 0:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            onstack[root] = True
+            work = [[root, ptr[root]]]
+            while work:
+                frame = work[-1]
+                v, e = frame
+                if e < ptr[v + 1]:
+                    frame[1] += 1
+                    t = succ[e]
+                    if index[t] < 0:
+                        index[t] = low[t] = counter
+                        counter += 1
+                        stack.append(t)
+                        onstack[t] = True
+                        work.append([t, ptr[t]])
+                    elif onstack[t] and index[t] < low[v]:
+                        low[v] = index[t]
+                    continue
+
+                # v is finished; pass its lowlink on and maybe pop a component
+                work.pop()
+                if work and low[v] < low[work[-1][0]]:
+                    low[work[-1][0]] = low[v]
+                if low[v] == index[v]:
+                    while True:
+                        t = stack.pop()
+                        onstack[t] = False
+                        comp[t] = label
+                        if t == v:
+                            break
+                    label += 1
+        return np.array(comp, dtype=np.int64)
+
+    def condensation(self):
+        """
+        the component labels of :meth:`components` and the edges between
+        components in CSR form: the components directly below component `c`
+        are `down[down_ptr[c]:down_ptr[c+1]]`, possibly with repetitions
+        """
+        comp = self.components()
+        ncomp = int(comp.max()) + 1 if len(comp) else 0
+        csrc, ctrg = comp[self.src], comp[self.succ]
+        between = csrc != ctrg
+        order = np.argsort(csrc[between], kind='stable')
+        down = ctrg[between][order]
+        down_ptr = np.zeros(ncomp + 1, dtype=np.int64)
+        np.cumsum(np.bincount(csrc[between], minlength=ncomp),
+                  out=down_ptr[1:])
+        return comp, down_ptr, down
+
+
+class EnergyArena(Arena):
+    """ Array-backed energy game with one integer effect per edge """
+    objective = "energy"
+
+    def __init__(self, nodes, owner, succ_ptr, succ, effect):
+        Arena.__init__(self, nodes, owner, succ_ptr, succ)
+        self.effect = np.asarray(effect, dtype=np.int64)
+
+    @classmethod
+    def from_energy_game(cls, eg):
+        """
+        build the array representation of an `EnergyGame`
+        """
+        nodes = list(eg.nodes())
+        index = {v: i for i, v in enumerate(nodes)}
+        owner = [eg.nodes[v]['owner'] for v in nodes]
+
+        succ_ptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        succ = []
+        effect = []
+        for i, v in enumerate(nodes):
+            for t, data in eg.adj[v].items():
+                succ.append(index[t])
+                effect.append(data['effect'])
+            succ_ptr[i + 1] = len(succ)
+        return cls(nodes, owner, succ_ptr, succ, effect)
+
+    @classmethod
+    def from_edges(cls, nodes, owner, source, target, effect):
+        """
+        build an arena from flat arrays of node ids and owners and of edges
+        given by source id, target id and effect (in any order)
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        index_of = indexer(nodes)
+        src, trg = index_of(source), index_of(target)
+        effect = np.asarray(effect, dtype=np.int64)
+
+        # sort edges by source, keeping the given order among siblings
+        perm = np.argsort(src, kind='stable')
+        succ_ptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(nodes)), out=succ_ptr[1:])
+        return cls(nodes, owner, succ_ptr, trg[perm], effect[perm])
+
+    def to_energy_game(self):
+        """
+        build the (networkx based) `EnergyGame` for this arena
+        """
+        from .games import EnergyGame
+        eg = EnergyGame()
+        for v, o in zip(self.nodes.tolist(), self.owner.tolist()):
+            eg.add_node(v, owner=o)
+        eg.add_edges_from(
+            (s, t, {'effect': w}) for s, t, w in zip(
+                self.nodes[self.src].tolist(), self.nodes[self.succ].tolist(),
+                self.effect.tolist()))
+        return eg
+
+    def edge_index(self, s, t):
+        """ position of the edge from vertex `s` to vertex `t` """
+        lo, hi = self.succ_ptr[s], self.succ_ptr[s + 1]
+        pos = np.flatnonzero(self.succ[lo:hi] == t)
+        if not len(pos):
+            raise KeyError("no edge from %d to %d" % (self.nodes[s],
+                                                      self.nodes[t]))
+        return lo + pos[0]
+
+    def with_edge(self, s, t, effect):
+        """
+        a copy with an additional edge from vertex `s` to vertex `t`, of
+        which there must be none yet
+        """
+        pos = self.succ_ptr[s + 1]
+        ptr = self.succ_ptr.copy()
+        ptr[s + 1:] += 1
+        return EnergyArena(self.nodes, self.owner, ptr,
+                           np.insert(self.succ, pos, t),
+                           np.insert(self.effect, pos, effect))
+
+    def without_edge(self, s, t):
+        """ a copy without the edge from vertex `s` to vertex `t` """
+        pos = self.edge_index(s, t)
+        ptr = self.succ_ptr.copy()
+        ptr[s + 1:] -= 1
+        return EnergyArena(self.nodes, self.owner, ptr,
+                           np.delete(self.succ, pos),
+                           np.delete(self.effect, pos))
+
+    def subarena(self, vs, targets=None, effect=None):
+        """
+        the arena made of the vertices `vs` with all their out-edges.
+
+        `targets` and `effect`, if given, replace the successors and effects
+        of these edges, in the order in which :func:`segments` lists them.
+        Successors outside of `vs` are appended as vertices without
+        out-edges. Returns the new arena together with the array of original
+        indices of its vertices.
+        """
+        edges, _ = segments(self.succ_ptr, vs)
+        if targets is None:
+            targets = self.succ[edges]
+        if effect is None:
+            effect = self.effect[edges]
+        outside = np.setdiff1d(targets, vs)
+        keep = np.concatenate([vs, outside])
+
+        # translate targets into indices of the sub-arena
+        order = np.argsort(keep, kind='stable')
+        local = order[np.searchsorted(keep[order], targets)]
+        ptr = np.zeros(len(keep) + 1, dtype=np.int64)
+        np.cumsum(self.out_degree()[vs], out=ptr[1:len(vs) + 1])
+        ptr[len(vs) + 1:] = ptr[len(vs)]
+        sub = EnergyArena(self.nodes[keep], self.owner[keep], ptr, local,
+                          effect)
+        return sub, keep
+
+    def induced(self, within):
+        """
+        the subgame induced by the boolean mask `within`: its vertices with
+        only the edges between them. Returns the new arena together with the
+        array of original indices of its vertices.
+        """
+        vs = np.flatnonzero(within)
+        local = np.cumsum(within) - 1
+        inside = within[self.src] & within[self.succ]
+        ptr = np.zeros(len(vs) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(local[self.src[inside]], minlength=len(vs)),
+                  out=ptr[1:])
+        sub = EnergyArena(self.nodes[vs], self.owner[vs], ptr,
+                          local[self.succ[inside]], self.effect[inside])
+        return sub, vs
+
+    def maxdrop(self):
+        """
+        the maximal energy loss on an out-edge of every vertex
+        (zero if no out-edge has a negative effect)
+        """
+        drop = np.zeros(len(self), dtype=np.int64)
+        nonempty = self.out_degree() > 0
+        if nonempty.any():
+            starts = self.succ_ptr[:-1][nonempty]
+            mins = np.minimum.reduceat(self.effect, starts)
+            drop[nonempty] = np.maximum(0, -mins)
+        return drop
+
+    def cutoff(self):
+        """
+        a bound above every finite minimal initial credit: one more than the
+        sum of the maximal drops of all vertices
+        """
+        return int(self.maxdrop().sum()) + 1
+
+    def credit_bounds(self):
+        """
+        an upper bound on the finite minimal initial credit of every vertex.
+
+        A winning play, with its cycles cut out, passes every vertex at most
+        once and never climbs back up the condensation, so it never needs more
+        credit than the maximal drops of the component it starts in plus the
+        largest bound among the components directly below. Components without
+        negative edges add nothing.
+        """
+        n = len(self)
+        if not n:
+            return np.zeros(0, dtype=np.int64)
+        comp, down_ptr, down = self.condensation()
+        ncomp = len(down_ptr) - 1
+        order = np.argsort(comp, kind='stable')
+        starts = np.zeros(ncomp, dtype=np.int64)
+        np.cumsum(np.bincount(comp, minlength=ncomp)[:-1], out=starts[1:])
+        bound = np.add.reduceat(self.maxdrop()[order], starts).tolist()
+
+        # labels are in reverse topological order, so components below have
+        # their bounds by the time they are needed
+        down, down_ptr = down.tolist(), down_ptr.tolist()
+        for c in range(ncomp):
+            below = down[down_ptr[c]:down_ptr[c + 1]]
+            if below:
+                bound[c] += max(bound[d] for d in below)
+        return np.array(bound, dtype=np.int64)[comp]
+
+
+class ParityArena(Arena):
+    """
+    Array-backed parity game with one priority per vertex.
+
+    `label`, if given, is a function that maps a range `lo, hi` of vertex
+    indices to a list of their labels; by default, vertices are labelled
+    by their node id.
+    """
+    objective = "parity"
+
+    # number of vertices per block yielded by :meth:`blocks`
+    BLOCKSIZE = 1 << 16
+
+    def __init__(self, nodes, owner, succ_ptr, succ, priority, label=None):
+        Arena.__init__(self, nodes, owner, succ_ptr, succ)
+        self.priority = np.asarray(priority, dtype=np.int64)
+        self.label = label
+
+    @classmethod
+    def from_parity_game(cls, pg):
+        """
+        build the array representation of a `ParityGame`
+        """
+        nodes = list(pg.nodes())
+        index = {v: i for i, v in enumerate(nodes)}
+        owner = [pg.nodes[v]['owner'] for v in nodes]
+        priority = [pg.nodes[v]['priority'] for v in nodes]
+        labels = [str(pg.nodes[v].get('label', v)) for v in nodes]
+
+        succ_ptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        succ = []
+        for i, v in enumerate(nodes):
+            succ.extend(index[t] for t in pg.adj[v])
+            succ_ptr[i + 1] = len(succ)
+        return cls(nodes, owner, succ_ptr, succ, priority,
+                   lambda lo, hi: labels[lo:hi])
+
+    def labels(self, lo, hi):
+        if self.label is not None:
+            return self.label(lo, hi)
+        return [str(v) for v in self.nodes[lo:hi].tolist()]
+
+    def blocks(self):
+        """
+        iterate over consecutive blocks of vertices as tuples of node ids,
+        owners, priorities, CSR offsets (starting at zero), successor node
+        ids and labels
+        """
+        for lo in range(0, len(self), self.BLOCKSIZE):
+            hi = min(lo + self.BLOCKSIZE, len(self))
+            ptr = self.succ_ptr[lo:hi + 1]
+            yield (self.nodes[lo:hi], self.owner[lo:hi],
+                   self.priority[lo:hi], ptr - ptr[0],
+                   self.nodes[self.succ[ptr[0]:ptr[-1]]], self.labels(lo, hi))
+
+    def to_parity_game(self):
+        """
+        build the (networkx based) `ParityGame` for this arena
+        """
+        return blocks_to_parity_game(self)
+
+
+def blocks_to_parity_game(game):
+    """
+    build a `ParityGame` from anything with `blocks` like
+    :meth:`ParityArena.blocks`
+    """
+    from .games import ParityGame
+    pg = ParityGame()
+    for ids, owner, priority, _, _, labels in game.blocks():
+        pg.add_nodes_from(
+            (v, {'owner': o, 'priority': p, 'label': label})
+            for v, o, p, label in zip(ids.tolist(), owner.tolist(),
+                                      priority.tolist(), labels))
+    for ids, _, _, ptr, succ, _ in game.blocks():
+        sources = np.repeat(ids, np.diff(ptr))
+        pg.add_edges_from(zip(sources.tolist(), succ.tolist()))
+    return pg
@@ -0,0 +1,157 @@
+# Copyright (C) 2017  Patrick Totzke <patricktotzke@gmail.com>
+# This file is released under the GNU GPL, version 3 or a later revision.
+"""
+Solve many games on a pool of worker processes.
+
+Games are read lazily from files, directories, glob patterns and json-lines
+streams (one game in 'eg' format per line), dispatched in chunks to the pool
+and reported as one json object per line and game. The number of chunks that
+are in flight, including those already solved but waiting to be written in
+input order, is bounded so that memory stays bounded too.
+"""
+
+import glob
+import io
+import json
+import logging
+import multiprocessing as mp
+import os
+import queue
+import sys
+from timeit import default_timer
+
+from .cache import CachedSolver
+from .readers import read_eg_stream, read_game
+from .solvers import ProgressMeasureSolver
+
+
+def _jsonl_games(infile, name):
+    for lineno, line in enumerate(infile, 1):
+        if line.strip():
+            yield ("%s:%d" % (name, lineno), None, line)
+
+
+def iter_games(sources):
+    """
+    iterate over the games in `sources`, as triples of a name and either a
+    file name or the game as string.
+
+    A source can be a directory (all files in it), a glob pattern, a file of
+    json lines (ending in '.jsonl'), '-' for json lines on stdin, or the name
+    of a file containing a single game.
+    """
+    for source in sources:
+        if source == '-':
+            yield from _jsonl_games(sys.stdin, '<stdin>')
+        elif os.path.isdir(source):
+            for name in sorted(os.listdir(source)):
+                path = os.path.join(source, name)
+                if os.path.isfile(path):
+                    yield (path, path, None)
+        elif glob.has_magic(source):
+            for path in sorted(glob.iglob(source)):
+                yield (path, path, None)
+        elif source.endswith('.jsonl'):
+            with open(source) as infile:
+                yield from _jsonl_games(infile, source)
+        else:
+            yield (source, source, None)
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def solve_one(name, path, text, mode='worklist', cache=None):
+    """
+    solve a single game and return the result as a dict; if a
+    :class:`~egsolver.cache.ResultCache` is given, it is consulted first
+    """
+    try:
+        start = default_timer()
+        if path is not None:
+            with open(path) as infile:
+                game = read_game(infile)
+        else:
+            game = read_eg_stream(io.StringIO(text))
+        parsed = default_timer()
+        if cache is not None:
+            solver = CachedSolver(game, cache, mode=mode)
+        else:
+            solver = ProgressMeasureSolver(game, mode=mode)
+        solver.solve()
+        solved = default_timer()
+        return {'game': name, 'win': solver.win,
+                'opt': solver.optimal_strategy(),
+                'parse': parsed - start, 'time': solved - parsed,
+                'stats': solver.stats.as_dict()}
+    except Exception as e:
+        return {'game': name, 'error': str(e)}
+
+
+def _solve_chunk(chunk, mode, cache):
+    return [solve_one(name, path, text, mode, cache)
+            for name, path, text in chunk]
+
+
+def run_batch(sources, outfile, workers=None, chunksize=1, max_inflight=None,
+              ordered=False, mode='worklist', cache=None):
+    """
+    solve all games in `sources` (see :func:`iter_games`) with a pool of
+    `workers` processes and write one json line per game to `outfile`.
+
+    :param chunksize: number of games sent to a worker at once
+    :param max_inflight: maximal number of chunks dispatched but not yet
+                         written; defaults to twice the number of workers
+    :param ordered: write results in input rather than completion order
+    :param cache: a :class:`~egsolver.cache.ResultCache` for known games
+    :returns: the number of games that could not be solved
+    """
+    workers = workers or os.cpu_count() or 1
+    max_inflight = max_inflight or 2 * workers
+    done = queue.Queue()
+    waiting = {}   # solved chunks that wait for their turn to be written
+    state = {'inflight': 0, 'next': 0, 'failed': 0}
+
+    def write(results):
+        for result in results:
+            if 'error' in result:
+                state['failed'] += 1
+                logging.error("%s: %s" % (result['game'], result['error']))
+            outfile.write(json.dumps(result) + '\n')
+        outfile.flush()
+
+    def collect():
+        idx, results = done.get()
+        state['inflight'] -= 1
+        if isinstance(results, Exception):
+            raise results
+        if not ordered:
+            write(results)
+            return
+        waiting[idx] = results
+        while state['next'] in waiting:
+            write(waiting.pop(state['next']))
+            state['next'] += 1
+
+    with mp.Pool(workers) as pool:
+        chunks = _chunks(iter_games(sources), chunksize)
+        for idx, chunk in enumerate(chunks):
+            while state['inflight'] + len(waiting) >= max_inflight:
+                collect()
+
+            def report(results, idx=idx):
+                done.put((idx, results))
+            pool.apply_async(_solve_chunk, (chunk, mode, cache),
+                             callback=report, error_callback=report)
+            state['inflight'] += 1
+        while state['inflight']:
+            collect()
+    return state['failed']
@@ -0,0 +1,150 @@
+# Copyright (C) 2017  Patrick Totzke <patricktotzke@gmail.com>
+# This file is released under the GNU GPL, version 3 or a later revision.
+"""
+Benchmark solvers on sweeps of random games.
+
+Every combination of game parameters and seed is generated and solved by
+each selected solver in a fresh process, so that its peak memory usage can
+be read off the process's resource usage. Results are one row per game and
+solver, holding the best wall time of several runs, the numbers of lifts
+and strict increases (see :class:`~egsolver.stats.SolverStats`) and the
+peak resident set size in KiB. They can be compared against the
+rows of an earlier run to spot regressions.
+"""
+
+import csv
+import itertools
+import json
+import logging
+import multiprocessing as mp
+import resource
+from timeit import default_timer
+
+from .generators import random_energy_arena
+from .solvers import ProgressMeasureSolver
+
+# named solver configurations to benchmark
+BENCH_SOLVERS = {
+    'worklist': {'mode': 'worklist'},
+    'jacobi': {'mode': 'jacobi'},
+    'scc': {'mode': 'worklist', 'scc': True},
+    'parallel': {'mode': 'worklist', 'workers': 2},
+    'preprocess': {'mode': 'worklist', 'preprocess': True},
+}
+
+# configurations whose counts vary from run to run, because their workers
+# lift asynchronously
+NONDETERMINISTIC = ('parallel',)
+
+# the columns that identify a benchmark, and all columns, in order
+KEY = ('solver', 'n', 'd', 'o', 'e', 'seed')
+COLUMNS = KEY + ('nodes', 'edges', 'time', 'lifts', 'increases', 'rss')
+
+
+def _run(job):
+    """ generate, solve and measure a single benchmark """
+    (solver, n, d, o, e, seed), repeat, nosinks = job
+    game = random_energy_arena(n, d, o, e, -e, nosinks, seed)
+    times = []
+    for _ in range(repeat):
+        s = ProgressMeasureSolver(game, **BENCH_SOLVERS[solver])
+        start = default_timer()
+        s.solve()
+        times.append(default_timer() - start)
+    return dict(zip(KEY, job[0]), nodes=s.arena.number_of_nodes(),
+                edges=s.arena.number_of_edges(), time=min(times),
+                lifts=s.stats.lifts, increases=s.stats.increases,
+                rss=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def _measure(job, conn):
+    conn.send(_run(job))
+    conn.close()
+
+
+def run_bench(solvers, sizes, densities, owners, effects, seeds, repeat=3,
+              nosinks=False):
+    """
+    benchmark all `solvers` (names in :data:`BENCH_SOLVERS`) on random
+    games for all combinations of the given numbers of nodes, edge
+    densities, owner ratios, maximal effects and random seeds.
+
+    :param repeat: number of times each game is solved; the best time counts
+    :returns: a list of result rows, dicts with the keys in :data:`COLUMNS`
+    """
+    jobs = [(key, repeat, nosinks) for key in itertools.product(
+        solvers, sizes, densities, owners, effects, seeds)]
+    rows = []
+    ctx = mp.get_context('spawn')
+    for job in jobs:
+        # a fresh (non-daemonic, so that solvers can have workers) process
+        receiver, sender = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_measure, args=(job, sender))
+        proc.start()
+        sender.close()
+        try:
+            row = receiver.recv()
+        except EOFError:
+            raise RuntimeError("benchmark %s died" % (job[0],))
+        finally:
+            proc.join()
+        logging.info("%(solver)s n=%(n)d d=%(d)g o=%(o)g e=%(e)d "
+                     "seed=%(seed)d: %(time)fs, %(lifts)d lifts, "
+                     "%(rss)d KiB" % row)
+        rows.append(row)
+    return rows
+
+
+def write_rows(rows, out, fmt='json'):
+    """ write result rows as json or csv to the file object `out` """
+    if fmt == 'csv':
+        writer = csv.DictWriter(out, COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        out.write(json.dumps(rows, indent=2) + '\n')
+
+
+def read_rows(infile):
+    """ read result rows written by :func:`write_rows` in either format """
+    text = infile.read()
+    if text.lstrip().startswith('['):
+        return json.loads(text)
+    rows = []
+    for row in csv.DictReader(text.splitlines()):
+        rows.append({k: v if k == 'solver' else json.loads(v)
+                     for k, v in row.items()})
+    return rows
+
+
+def compare(rows, baseline, tolerance=0.2):
+    """
+    compare result rows against those of a `baseline` run.
+
+    A benchmark regressed if it took more than `tolerance` (relatively)
+    longer or more memory than before, or if it needed more lifts or
+    increases. Counts are not compared for :data:`NONDETERMINISTIC`
+    configurations. Benchmarks that are missing in the baseline are
+    ignored.
+
+    :returns: a list of messages, one per regression
+    """
+    before = {tuple(row[k] for k in KEY): row for row in baseline}
+    regressions = []
+    for row in rows:
+        key = tuple(row[k] for k in KEY)
+        if key not in before:
+            continue
+        old = before[key]
+        name = "%s n=%d d=%g o=%g e=%d seed=%d" % key
+        for column in ('time', 'rss'):
+            if row[column] > old[column] * (1 + tolerance):
+                regressions.append("%s: %s went up from %g to %g" % (
+                    name, column, old[column], row[column]))
+        if row['solver'] in NONDETERMINISTIC:
+            continue
+        for column in ('lifts', 'increases'):
+            if row[column] > old[column]:
+                regressions.append("%s: %s went up from %d to %d" % (
+                    name, column, old[column], row[column]))
+    return regressions
@@ -0,0 +1,152 @@
+# Copyright (C) 2017  Patrick Totzke <patricktotzke@gmail.com>
+# This file is released under the GNU GPL, version 3 or a later revision.
+"""
+Keep the results of solved energy games in a directory.
+
+Results are stored under a hash of the game's owners, edges and effects
+(see :func:`game_key`), so that the same game is recognised no matter in
+which format, or in which order of nodes, edges and keys, it comes. An
+entry is a json file holding the winning region, an optimal strategy and
+the stats of the solver that found them. The directory is kept below a
+given size by removing the least recently used entries, where reading an
+entry counts as a use. Several processes can share a directory.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+from .arenas import indexer
+from .solvers import ProgressMeasureSolver, Solver
+from .stats import SolverStats
+
+# default maximal size of a cache directory in bytes
+MAX_BYTES = 256 << 20
+
+
+def game_key(arena):
+    """
+    a hash of an energy arena that only depends on the owners of its nodes
+    and the effects of its edges, given by node ids, but not on their order
+    """
+    order = np.argsort(arena.nodes, kind='stable')
+    src, trg = arena.nodes[arena.src], arena.nodes[arena.succ]
+    perm = np.lexsort((arena.effect, trg, src))
+    h = hashlib.sha256(b'energy')
+    for data in (np.array([len(arena), arena.number_of_edges()]),
+                 arena.nodes[order], arena.owner[order],
+                 src[perm], trg[perm], arena.effect[perm]):
+        h.update(np.ascontiguousarray(data, dtype='<i8').tobytes())
+    return h.hexdigest()
+
+
+class ResultCache(object):
+    """
+    A directory of results, keyed by :func:`game_key`, which holds at most
+    about `max_bytes` bytes.
+    """
+
+    def __init__(self, directory, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        """ the result stored under `key`, or None """
+        path = self.path(key)
+        try:
+            with open(path) as infile:
+                result = json.load(infile)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return result
+
+    def put(self, key, result):
+        """ store a result (a json serialisable dict) under `key` """
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as out:
+            json.dump(result, out)
+        os.replace(tmp, self.path(key))
+        self.evict()
+
+    def evict(self):
+        """ remove the least recently used entries until the cache fits """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(e[1] for e in entries)
+        for _, nbytes, path in sorted(entries):
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            size -= nbytes
+
+
+class CachedSolver(Solver):
+    """
+    Solve an energy game with a `solver` class (and the given options),
+    unless its result is found in a :class:`ResultCache`, to which new
+    results are added.
+
+    Cached results come with the stats of the solver that computed them,
+    which are kept in :attr:`cached_stats` on a hit, while :attr:`stats`
+    only counts the hit and the time it took.
+    As optimal strategies break ties by the order of edges, a cached
+    strategy may differ from the one a solver would pick, but it is optimal
+    all the same.
+    """
+
+    def __init__(self, eg, cache, stats=None, solver=ProgressMeasureSolver,
+                 **options):
+        Solver.__init__(self, eg, stats)
+        self.cache = cache
+        self.solver = solver
+        self.options = options
+        self.cached_stats = None
+        self._opt = None
+
+    def solve(self):
+        with self.stats.phase('cache'):
+            key = game_key(self.arena)
+            result = self.cache.get(key)
+        if result is not None:
+            logging.info("found result in cache")
+            self.stats.count(hits=1)
+            self.cached_stats = SolverStats.from_dict(result['stats'])
+        else:
+            solver = self.solver(self.arena, **self.options)
+            solver.solve()
+            opt = solver.optimal_strategy()
+            self.stats.merge(solver.stats)
+            result = {'win': solver.win, 'opt': opt,
+                      'stats': solver.stats.as_dict()}
+            with self.stats.phase('cache'):
+                self.cache.put(key, result)
+        self.win = {int(v): w for v, w in result['win'].items()}
+        self._opt = result['opt']
+        return self.win
+
+    def strategy_array(self):
+        opt = np.full(len(self.arena), -1, dtype=np.int64)
+        if self._opt:
+            index_of = indexer(self.arena.nodes)
+            src = np.array(list(map(int, self._opt)), dtype=np.int64)
+            trg = np.array(list(self._opt.values()), dtype=np.int64)
+            opt[index_of(src)] = index_of(trg)
+        return opt
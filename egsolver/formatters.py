@@ -1,39 +1,88 @@
 # Copyright (C) 2017  Patrick Totzke <patricktotzke@gmail.com>
 # This file is released under the GNU GPL, version 3 or a later revision.
 
+import io
 import logging
 import json
-import networkx as nx
+import numpy as np
 
+from .arenas import Arena, EnergyArena
+from .readers import EGB_MAGIC, EGB_LAYOUT
 
-def game_format_eg(game, indent=2):
+
+# number of lines that the streaming writers buffer before writing them
+CHUNK_LINES = 4096
+
+
+def _write_lines(out, lines, sep=",\n"):
+    """ write `sep`-separated lines to `out`, a chunk at a time """
+    first = True
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == CHUNK_LINES:
+            out.write(("" if first else sep) + sep.join(chunk))
+            chunk, first = [], False
+    if chunk:
+        out.write(("" if first else sep) + sep.join(chunk))
+
+
+def write_game_eg(game, out, indent=2):
     """
-    format a game as (pretty printed) json string
+    write a game as (pretty printed) json to the file object `out`,
+    line by line
     """
-    GAME_FILE_FORMAT = "{{\n\"objective\": \"{objective}\",\n"\
-        + "\"nodes\":{nodes},\n" \
-        + "\"edges\":{edges}\n}}"\
-        + "\n"
+    pad = indent * " "
+    if hasattr(game, 'blocks'):
+        def block_edges(block):
+            ids, _, _, ptr, succ, _ = block
+            sources = np.repeat(ids, np.diff(ptr))
+            return zip(sources.tolist(), succ.tolist())
+        nodelines = (pad + '{"id": %d, "owner": %d}' % vo
+                     for block in game.blocks()
+                     for vo in zip(block[0].tolist(), block[1].tolist()))
+        edgelines = (pad + '{"source": %d, "target": %d}' % e
+                     for block in game.blocks() for e in block_edges(block))
+    elif isinstance(game, EnergyArena):
+        nodelines = (pad + '{"id": %d, "owner": %d}' % vo for vo in zip(
+            game.nodes.tolist(), game.owner.tolist()))
+        edgelines = (pad + '{"effect": %d, "source": %d, "target": %d}' % e
+                     for e in zip(game.effect.tolist(),
+                                  game.nodes[game.src].tolist(),
+                                  game.nodes[game.succ].tolist()))
+    else:
+        def nodeline(v):
+            return pad + json.dumps({'id': v, 'owner': game.nodes[v]['owner']})
+        nodelines = (nodeline(v) for v in game.nodes())
 
-    def nodeline(v):
-        return indent * " " + json.dumps({'id':v,
-                                          'owner':game.node[v]['owner']})
+        def edgeline(e):
+            edict = dict(game.edges[e], source=e[0], target=e[1])
+            return pad + json.dumps(edict)
+        edgelines = (edgeline(e) for e in game.edges)
 
-    def edgeline(e):
-        edict = game.edges[e]
-        edict.update({'source':e[0], 'target':e[1]})
-        return indent * " " + json.dumps(edict)
+    out.write("{\n\"objective\": \"%s\",\n\"nodes\":[\n" % game.objective)
+    _write_lines(out, nodelines)
+    out.write("\n],\n\"edges\":[\n")
+    _write_lines(out, edgelines)
+    out.write("\n]\n}\n")
 
-    elist_json = "[\n" + ",\n".join([edgeline(e) for e in game.edges]) + "\n]"
 
-    nlist = game.nodes()
-    nlist_json = "[\n" + ",\n".join([nodeline(v) for v in nlist]) + "\n]"
-    return GAME_FILE_FORMAT.format(objective=game.objective,
-                                   nodes=nlist_json,
-                                   edges=elist_json,)
+def game_format_eg(game, indent=2):
+    """
+    format a game as (pretty printed) json string
+    """
+    out = io.StringIO()
+    write_game_eg(game, out, indent)
+    return out.getvalue()
 
 
 def game_format_dot(game):
+    import networkx as nx
+    if hasattr(game, 'to_parity_game'):
+        game = game.to_parity_game()
+    elif isinstance(game, Arena):
+        game = game.to_energy_game()
+
     def propfmt(k, v):
         fmt = "{}={}"
         if isinstance(v, str):
@@ -44,7 +93,7 @@ def game_format_dot(game):
         return ", ".join([propfmt(k, v) for k, v in props.items()])
 
     def dotnode(v):
-        return "%d [%s];" % (v, propsfmt(game.node[v]))
+        return "%d [%s];" % (v, propsfmt(game.nodes[v]))
 
     def dotedge(e):
         s, t = e
@@ -54,7 +103,7 @@ def game_format_dot(game):
     # shape nodes according to owner
     shape = {}
     for v in game.nodes():
-        shape[v] = "box" if game.node[v]['owner'] else "diamond"
+        shape[v] = "box" if game.nodes[v]['owner'] else "diamond"
     nx.set_node_attributes(game, shape, name='shape')
 
     return "digraph G {{\n{}\n{}\n}}\n".format(
@@ -63,21 +112,77 @@ def game_format_dot(game):
     )
 
 
+def write_pgsolver(game, out):
+    """
+    write a parity game in pgsolver format to the file object `out`, one
+    block of vertices at a time. `game` can be anything that has `blocks`,
+    like a :class:`~egsolver.arenas.ParityArena` or an implicit
+    :class:`~egsolver.reductions.EnergyParityView`.
+    """
+    out.write("parity %d;\n" % game.number_of_nodes())
+    for ids, owner, priority, ptr, succ, labels in game.blocks():
+        succ, ptr = [str(t) for t in succ.tolist()], ptr.tolist()
+        out.write("".join(
+            '%d %d %d %s "%s";\n' % (v, p, o, ",".join(succ[lo:hi]), label)
+            for v, p, o, lo, hi, label in zip(
+                ids.tolist(), priority.tolist(), owner.tolist(),
+                ptr[:-1], ptr[1:], labels)))
+
+
+def write_game_dot(game, out):
+    out.write(game_format_dot(game))
+
+
+def write_game_egb(game, out):
+    """
+    write an energy game in the binary 'egb' format to a file object
+    (see :data:`~egsolver.readers.EGB_MAGIC` for the layout)
+    """
+    if hasattr(out, 'buffer'):
+        out.flush()
+        out = out.buffer
+    if not isinstance(game, EnergyArena):
+        game = EnergyArena.from_energy_game(game)
+    out.write(EGB_MAGIC)
+    out.write(np.array([game.number_of_nodes(), game.number_of_edges()],
+                       dtype='<i8').tobytes())
+    for name, dtype, _ in EGB_LAYOUT:
+        data = np.ascontiguousarray(getattr(game, name), dtype=dtype)
+        out.write(memoryview(data).cast('B'))
+        out.write(b'\0' * (-data.nbytes % 8))
+
+
 GAME_FORMATTERS = {
     'eg': game_format_eg,
     'dot': game_format_dot,
 }
 
+GAME_WRITERS = {
+    'eg': write_game_eg,
+    'egb': write_game_egb,
+    'dot': write_game_dot,
+}
+
 
 def result_format_report(game, solver, time):
-    res = "This game has %d nodes and %d edges.\n" % (len(game.nodes()),
-                                                      len(game.edges()))
+    res = "This game has %d nodes and %d edges.\n" % (game.number_of_nodes(),
+                                                      game.number_of_edges())
     res += "The winning region is: %s\n" % solver.win
     opt = solver.optimal_strategy()
     if opt:
         opt = ", ".join([ "%d-->%d" % (s,t) for (s,t) in opt.items()])
         res += "An optimal strategy is: %s\n" % opt
     res += "It took me %fs to solve this game.\n" % time
+    stats = solver.stats
+    if stats.lifts:
+        res += "I did %d lifts, %d of which increased a measure " % (
+            stats.lifts, stats.increases)
+        res += "(%d enqueued, %d saturated).\n" % (stats.enqueues,
+                                                   stats.saturations)
+    if stats.hits:
+        res += "I found the result in a cache.\n"
+    res += "Time per phase: %s\n" % ", ".join(
+        "%s %fs" % phase for phase in stats.timings.items())
     res += "Goodbye.\n"
     return res
 
@@ -87,11 +192,17 @@ def result_format_json(game, solver, time):
     return json.dumps({
         'win': solver.win,
         'opt': opt,
-        'time': time
+        'time': time,
+        'stats': solver.stats.as_dict()
     }) + '\n'
 
 
 def result_format_dot(game, solver, time):
+    import networkx as nx
+    if hasattr(game, 'to_parity_game'):
+        game = game.to_parity_game()
+    elif isinstance(game, Arena):
+        game = game.to_energy_game()
     win = solver.win
     opt = solver.optimal_strategy()
     nx.set_node_attributes(game, win, name='win')
@@ -124,3 +235,31 @@ RESULT_FORMATTERS = {
     'json': result_format_json,
     'dot': result_format_dot,
 }
+
+
+def query_format_report(node, credit, value, solver, time):
+    if value < 0 and credit is None:
+        res = "Node %d is lost, whatever the credit.\n" % node
+    elif value < 0:
+        res = "A credit of %d does not suffice at node %d.\n" % (credit, node)
+    else:
+        res = "Node %d is won with a credit of %d.\n" % (node, value)
+    res += "It took me %fs to find out, with %d lifts.\n" % (
+        time, solver.stats.lifts)
+    return res
+
+
+def query_format_json(node, credit, value, solver, time):
+    return json.dumps({
+        'node': node,
+        'credit': credit,
+        'win': value,
+        'time': time,
+        'stats': solver.stats.as_dict()
+    }) + '\n'
+
+
+QUERY_FORMATTERS = {
+    'report': query_format_report,
+    'json': query_format_json,
+}
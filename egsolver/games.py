@@ -1,6 +1,7 @@
 # Copyright (C) 2017  Patrick Totzke <patricktotzke@gmail.com>
 # This file is released under the GNU GPL, version 3 or a later revision.
 
+import io
 import json
 import networkx as nx
 
@@ -42,13 +43,8 @@ class ParityGame(Game):
     objective = "parity"
 
     def to_pgsolver_format(self):
-        res = "parity %d;\n" % len(self.nodes())
-        for v in self.nodes():
-            res = res + ' '.join(
-                (str(v),
-                 str(self.node[v]['priority']),
-                 str(self.node[v]['owner']),
-                 ','.join(str(v) for v in self.successors(v)),
-                 '\"{}\";\n'.format(self.node[v]['label'])
-                 ))
-        return res
+        from .arenas import ParityArena
+        from .formatters import write_pgsolver
+        out = io.StringIO()
+        write_pgsolver(ParityArena.from_parity_game(self), out)
+        return out.getvalue()
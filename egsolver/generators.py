@@ -1,14 +1,34 @@
 # Copyright (C) 2017  Patrick Totzke <patricktotzke@gmail.com>
 # This file is released under the GNU GPL, version 3 or a later revision.
 
-import random
-import networkx as nx
-from .games import EnergyGame
+import numpy as np
 
+from .arenas import EnergyArena
 
-def random_energy_game(n, d, o, maxeffect, mineffect=None, nosinks=False):
+
+def _effects(rng, m, maxeffect, mineffect=None):
+    mineffect = mineffect or -maxeffect
+    return rng.integers(mineffect, maxeffect, size=m, endpoint=True)
+
+
+def _owners(rng, n, o):
+    return (rng.random(n) > o).astype(np.int8)
+
+
+def _arena(owner, source, target, effect):
+    return EnergyArena.from_edges(np.arange(len(owner)), owner, source,
+                                  target, effect)
+
+
+def random_energy_arena(n, d, o, maxeffect, mineffect=None, nosinks=False,
+                        seed=None):
     """
-    generates a random energy game graph.
+    generates a random energy game as :class:`~egsolver.arenas.EnergyArena`.
+
+    Every pair of distinct nodes is connected with probability `d`; the edges
+    are drawn as a sample of distinct pair indices, which takes time and
+    memory linear in the number of edges even for sparse games with millions
+    of nodes. Every node also gets a self-loop with probability `d`.
 
     :param n: number of nodes
     :type n: int
@@ -20,28 +40,126 @@ def random_energy_game(n, d, o, maxeffect, mineffect=None, nosinks=False):
     :type maxeffect: int
     :param mineffect: maximal negative edge effect (defaults to -maxeffect)
     :type mineffect: int
-    :param nosinks: add negative-effect self-loops to sink nodes
+    :param nosinks: add a decreasing self-loop to every node that did not get
+                    a random one (makes sinks losing)
     :type nosinks: bool
+    :param seed: seed for the random number generator
+    :type seed: int
     """
-    eg = EnergyGame(nx.fast_gnp_random_graph(n, d, directed=True))
+    rng = np.random.default_rng(seed)
 
-    # add random effects to all edges
-    mineffect = mineffect or -maxeffect
-    effect = {e: random.randint(mineffect, maxeffect) for e in eg.edges()}
-    nx.set_edge_attributes(eg, effect, name='effect')
-
-    # randomly assign owner to each node
-    owner = {v: 1*(random.random() > o) for v in eg.nodes()}
-    nx.set_node_attributes(eg, owner, name='owner')
-
-    # the generator nx.fast_gnp_random_graph used above specifically avoids
-    # self-loops, so we'll add them ourselves
-    for v in eg.nodes():
-        if random.random() <= d:
-            # add a random self-loop according to edge probability
-            eg.add_edge(v, v, effect=random.randint(mineffect, maxeffect))
-        elif nosinks:
-            # if no self-loop was generated but sinks are forbidden, add a
-            # decreasing self-loop (makes the state losing)
-            eg.add_edge(v, v, effect=-1)
-    return eg
+    # pick edges between distinct nodes as indices into all n*(n-1) pairs
+    pairs = n * (n - 1)
+    m = rng.binomial(pairs, d) if pairs else 0
+    pick = np.sort(rng.choice(pairs, size=m, replace=False)) if m else \
+        np.zeros(0, dtype=np.int64)
+    source, rest = np.divmod(pick, max(1, n - 1))
+    target = rest + (rest >= source)
+
+    # self-loops with the same probability, or decreasing ones if there
+    # must not be any sinks
+    loop = rng.random(n) <= d
+    loops = np.flatnonzero(loop | nosinks)
+    effect = _effects(rng, m + len(loops), maxeffect, mineffect)
+    effect[m:][~loop[loops]] = -1
+
+    return _arena(_owners(rng, n, o), np.concatenate([source, loops]),
+                  np.concatenate([target, loops]), effect)
+
+
+def bounded_energy_arena(n, k, o, maxeffect, mineffect=None, seed=None):
+    """
+    generates a random energy game in which every node has exactly `k`
+    distinct successors, chosen at random
+    """
+    rng = np.random.default_rng(seed)
+    k = min(k, n)
+
+    # sorted draws from 0..n-k, shifted apart, are k distinct nodes
+    target = np.sort(rng.integers(0, n - k + 1, size=(n, k)), axis=1)
+    target += np.arange(k)
+    source = np.repeat(np.arange(n), k)
+    return _arena(_owners(rng, n, o), source, target.ravel(),
+                  _effects(rng, n * k, maxeffect, mineffect))
+
+
+def grid_energy_arena(rows, cols, o, maxeffect, mineffect=None, seed=None):
+    """
+    generates an energy game on a `rows` x `cols` torus, where every node
+    moves either right or down, with random owners and effects
+    """
+    rng = np.random.default_rng(seed)
+    n = rows * cols
+    r, c = np.divmod(np.arange(n), cols)
+    right = r * cols + (c + 1) % cols
+    down = (r + 1) % rows * cols + c
+    source = np.repeat(np.arange(n), 2)
+    target = np.stack([right, down], axis=1).ravel()
+    return _arena(_owners(rng, n, o), source, target,
+                  _effects(rng, 2 * n, maxeffect, mineffect))
+
+
+def layered_energy_arena(layers, width, k, o, maxeffect, mineffect=None,
+                         seed=None):
+    """
+    generates an energy game with `layers` layers of `width` nodes each,
+    where every node has `k` distinct random successors in the next layer
+    and the last layer leads back into the first
+    """
+    rng = np.random.default_rng(seed)
+    n = layers * width
+    k = min(k, width)
+    layer = np.arange(n) // width
+    offset = np.sort(rng.integers(0, width - k + 1, size=(n, k)), axis=1)
+    offset += np.arange(k)
+    target = (layer + 1) % layers * width
+    target = target[:, None] + offset
+    source = np.repeat(np.arange(n), k)
+    return _arena(_owners(rng, n, o), source, target.ravel(),
+                  _effects(rng, n * k, maxeffect, mineffect))
+
+
+def ring_energy_arena(n, maxeffect):
+    """
+    a known worst case for progress measure lifting: a single cycle of `n`
+    nodes (n even) with effects alternating between `maxeffect` and
+    `-(maxeffect + 1)`.
+
+    The cycle loses one unit of energy per two steps, so every node is
+    losing, but lifting only finds out once the measures have crept up to the
+    cutoff, about n * maxeffect / 2, one unit per round trip.
+    """
+    n += n % 2
+    source = np.arange(n)
+    target = (source + 1) % n
+    effect = np.where(source % 2, -(maxeffect + 1), maxeffect)
+    return _arena(np.zeros(n, dtype=np.int8), source, target, effect)
+
+
+def random_energy_game(n, d, o, maxeffect, mineffect=None, nosinks=False,
+                       seed=None):
+    """
+    generates a random energy game graph, see :func:`random_energy_arena`.
+    """
+    return random_energy_arena(n, d, o, maxeffect, mineffect, nosinks,
+                               seed).to_energy_game()
+
+
+def _isqrt(n):
+    return max(1, int(np.sqrt(n)))
+
+
+# generators of game families by name, called with the parameters of the
+# 'generate' subcommand
+GAME_FAMILIES = {
+    'gnp': lambda n, d, o, e, nosinks, k, seed:
+        random_energy_arena(n, d, o, e, -e, nosinks, seed),
+    'bounded': lambda n, d, o, e, nosinks, k, seed:
+        bounded_energy_arena(n, k, o, e, -e, seed),
+    'grid': lambda n, d, o, e, nosinks, k, seed:
+        grid_energy_arena(_isqrt(n), n // _isqrt(n), o, e, -e, seed),
+    'layered': lambda n, d, o, e, nosinks, k, seed:
+        layered_energy_arena(n // _isqrt(n), _isqrt(n), k, o, e, -e, seed),
+    'ring': lambda n, d, o, e, nosinks, k, seed:
+        ring_energy_arena(n, e),
+}
@@ -0,0 +1,170 @@
+# Copyright (C) 2017  Patrick Totzke <patricktotzke@gmail.com>
+# This file is released under the GNU GPL, version 3 or a later revision.
+"""
+Lifting engines for progress measures on an
+:class:`~egsolver.arenas.EnergyArena`.
+
+Each engine takes an initial measure `pm` that lies below the least fixpoint
+and lifts it in place until the least fixpoint is reached. Values at or above
+`cutoff`, a single number or an array with a cutoff per vertex, are replaced
+by `top`, which marks losing vertices. If `stats`, a
+:class:`~egsolver.stats.SolverStats`, is given, the engine adds its counts
+to it; counting happens in local variables, and engines only trace single
+lifts if debug logging was enabled when they started. If a vertex `stop` is
+given, lifting ends early once its measure has reached top.
+"""
+
+from collections import deque
+import logging
+import numpy as np
+
+from .arenas import segments
+
+
+def lift_worklist(arena, pm, cutoff, top, stats=None, stop=None):
+    """
+    chaotic iteration driven by a deduplicated FIFO worklist.
+
+    Only vertices whose measure is inconsistent with one of their out-edges
+    are ever enqueued. Every vertex of player 0 (the minimizer) keeps a counter
+    of the successors that still achieve its current measure, as in Brim et
+    al., so that it is only reconsidered once this counter drops to zero.
+    """
+    minimizer = arena.owner == 0
+    cutoff = np.broadcast_to(cutoff, len(arena))
+
+    # an edge is consistent if it does not demand a larger measure
+    demand = pm[arena.succ] - arena.effect
+    demand[demand >= cutoff[arena.src]] = top
+    consistent = demand <= pm[arena.src]
+    count = np.bincount(arena.src[consistent], minlength=len(arena))
+    broken = np.bincount(arena.src[~consistent], minlength=len(arena))
+    dirty = np.where(minimizer, count == 0, broken > 0)
+    dirty &= (arena.out_degree() > 0) & (pm < top)
+    queue = deque(np.flatnonzero(dirty).tolist())
+    saturated = np.count_nonzero(pm == top)
+
+    # the loop below only touches a handful of entries per lift, which is
+    # much cheaper on python lists than on numpy arrays
+    measure, cutoff = pm.tolist(), cutoff.tolist()
+    minimizer, count = minimizer.tolist(), count.tolist()
+    dirty = dirty.tolist()
+    effect = arena.effect.tolist()
+    succ, succ_ptr = arena.succ.tolist(), arena.succ_ptr.tolist()
+    pred, pred_ptr = arena.pred.tolist(), arena.pred_ptr.tolist()
+    pred_edge = arena.pred_edge.tolist()
+
+    trace = logging.getLogger().isEnabledFor(logging.DEBUG)
+    every = stats.every if stats is not None and stats.hook else 0
+    lifts = increases = done = 0
+    enqueues = len(queue)
+    sample = every or -1
+    while queue:
+        v = queue.popleft()
+        dirty[v] = False
+        lifts += 1
+        if lifts == sample:
+            stats.count(lifts - done, increases, enqueues)
+            stats.sample()
+            done, increases, enqueues = lifts, 0, 0
+            sample += every
+
+        # compute the new measure of v
+        lo, hi = succ_ptr[v], succ_ptr[v + 1]
+        demand = [measure[succ[e]] - effect[e] for e in range(lo, hi)]
+        if minimizer[v]:
+            nextval = min(demand)
+            count[v] = demand.count(nextval)
+        else:
+            nextval = max(demand)
+        if nextval >= cutoff[v]:
+            nextval = top
+            count[v] = 0
+
+        # really update only on strict increases
+        oldval = measure[v]
+        if nextval <= oldval:
+            continue
+        measure[v] = nextval
+        increases += 1
+        if trace:
+            logging.debug("lift %d: %d -> %d" % (v, oldval, nextval))
+        if v == stop and nextval >= top:
+            break
+
+        # look for predecessors whose edge into v just became inconsistent
+        for k in range(pred_ptr[v], pred_ptr[v + 1]):
+            u = pred[k]
+            current = measure[u]
+            if current >= top or dirty[u]:
+                continue
+            w = effect[pred_edge[k]]
+            if nextval - w <= current or oldval - w > current:
+                continue
+
+            # minimizers lose one consistent successor; maximizers are dirty
+            if minimizer[u]:
+                count[u] -= 1
+                if count[u]:
+                    continue
+            dirty[u] = True
+            queue.append(u)
+            enqueues += 1
+
+    pm[:] = measure
+    if stats is not None:
+        stats.count(lifts - done, increases, enqueues,
+                    np.count_nonzero(pm == top) - saturated)
+    return pm
+
+
+def lift_jacobi(arena, pm, cutoff, top, stats=None, stop=None):
+    """
+    bulk (Jacobi-style) iteration that lifts the whole dirty set at once.
+
+    Every round computes the new measure of all dirty vertices with segment
+    reductions over their out-edges, applies all strict increases together and
+    marks the predecessors of increased vertices dirty for the next round.
+    """
+    owner, effect = arena.owner, arena.effect
+    succ, succ_ptr = arena.succ, arena.succ_ptr
+    pred, pred_ptr = arena.pred, arena.pred_ptr
+    nonsink = arena.out_degree() > 0
+    cutoff = np.broadcast_to(cutoff, len(arena))
+
+    dirty = np.flatnonzero(nonsink & (pm < top))
+    saturated = np.count_nonzero(pm == top)
+    sample = stats.lifts + stats.every if stats is not None else 0
+    while len(dirty):
+        edges, starts = segments(succ_ptr, dirty)
+        demand = pm[succ[edges]] - effect[edges]
+        nextval = np.where(owner[dirty] == 0,
+                           np.minimum.reduceat(demand, starts),
+                           np.maximum.reduceat(demand, starts))
+        nextval[nextval >= cutoff[dirty]] = top
+
+        # really update only on strict increases
+        up = nextval > pm[dirty]
+        lifted = dirty[up]
+        pm[lifted] = nextval[up]
+
+        # predecessors of lifted vertices are dirty in the next round
+        preds, _ = segments(pred_ptr, lifted)
+        preds = np.unique(pred[preds])
+        if stats is not None:
+            stats.count(len(up), len(lifted), len(up))
+            if stats.lifts >= sample:
+                stats.sample()
+                sample = stats.lifts + stats.every
+        dirty = preds[pm[preds] < top]
+        if stop is not None and pm[stop] >= top:
+            break
+    if stats is not None:
+        stats.count(saturations=np.count_nonzero(pm == top) - saturated)
+    return pm
+
+
+LIFTING_MODES = {
+    'worklist': lift_worklist,
+    'jacobi': lift_jacobi,
+}
@@ -1,52 +1,107 @@
 # Copyright (C) 2017  Patrick Totzke <patricktotzke@gmail.com>
 # This file is released under the GNU GPL, version 3 or a later revision.
 
+import importlib
+import json
+import os
 import sys
-from timeit import timeit
+from timeit import default_timer, timeit
 import argparse
 import logging
 
-from .games import EnergyGame
-from .generators import random_energy_game
-from .solvers import ProgressMeasureSolver as Solver
-from .formatters import GAME_FORMATTERS, RESULT_FORMATTERS
-from .reductions import energy_to_parity
 from . import __version__, __shortinfo__
 
 
+class LazyChoices(object):
+    """
+    the names in a registry of one of our modules, which is only imported
+    when they are needed, so that building the parser (and with it, plain
+    `egsolver --help`) does not import numpy and networkx. Unless `strict`,
+    any name is accepted; a server checks the names anyway.
+    """
+
+    def __init__(self, module, registry, extra=(), strict=True):
+        self.module = module
+        self.registry = registry
+        self.extra = list(extra)
+        self.strict = strict
+        self._names = None
+
+    def names(self):
+        if self._names is None:
+            module = importlib.import_module(self.module, __package__)
+            self._names = self.extra + list(getattr(module, self.registry))
+        return self._names
+
+    def __iter__(self):
+        return iter(self.names())
+
+    def __contains__(self, name):
+        return not self.strict or name in self.names()
+
+
 def convert(args):
     """ convert game description to another format """
+    from .readers import read_game
+    from .reductions import EnergyParityView
+    from .formatters import GAME_WRITERS, write_pgsolver
     logging.info("parsing input..")
-    game = EnergyGame.from_game_string(args.infile.read())
+    game = read_game(args.infile)
     logging.debug("got game:\n%s" % game)
-    if args.gametype == "parity":
+    if game.objective != args.gametype:
+        if args.gametype != "parity":
+            raise Exception("cannot convert parity games to energy games")
         logging.debug("converting to paritygame..")
-        game = energy_to_parity(game)
+        game = EnergyParityView(game)
+    logging.info("writing output..")
     if args.outfmt == "pgsolver":
-        out = game.to_pgsolver_format()
+        write_pgsolver(game, args.outfile)
     else:
-        formatter = GAME_FORMATTERS[args.outfmt]
-        out = formatter(game)
-    logging.info("writing output..")
-    args.outfile.write(out)
+        GAME_WRITERS[args.outfmt](game, args.outfile)
 
 
 def generate(args):
     """ generate a random game """
-    eg = random_energy_game(args.n, args.d, args.o, args.e, -args.e,
-                            args.nosinks)
-    formatter = GAME_FORMATTERS[args.outfmt]
-    args.outfile.write(formatter(eg))
+    from .generators import GAME_FAMILIES
+    from .formatters import GAME_WRITERS
+    eg = GAME_FAMILIES[args.family](args.n, args.d, args.o, args.e,
+                                    args.nosinks, args.degree, args.seed)
+    GAME_WRITERS[args.outfmt](eg, args.outfile)
 
 
 def solve(args):
     """ solve a game """
+    from .readers import read_game
+    from .arenas import Arena, EnergyArena
+    from .solvers import ENERGY_SOLVERS, ZielonkaSolver, choose_solver
+    from .formatters import RESULT_FORMATTERS
     logging.info("parsing input..")
-    eg = EnergyGame.from_game_string(args.infile.read())
+    eg = read_game(args.infile)
     logging.debug("got game:\n%s" % eg)
 
     logging.info("instanciating solver..")
-    solver = Solver(eg)
+    if args.node is not None:
+        return query(args, eg)
+    if eg.objective == "parity":
+        solver = ZielonkaSolver(eg)
+    else:
+        arena, name = eg, args.solver
+        if name == 'auto':
+            if not isinstance(eg, Arena):
+                arena = EnergyArena.from_energy_game(eg)
+            name = choose_solver(arena)
+            logging.info("picked solver '%s'" % name)
+        options = {}
+        if name == 'pm':
+            options = dict(mode=args.mode, workers=args.workers,
+                           scc=args.scc, preprocess=args.preprocess)
+        if args.cache:
+            from .cache import CachedSolver, ResultCache
+            cache = ResultCache(args.cache, args.cache_size << 20)
+            solver = CachedSolver(arena, cache, solver=ENERGY_SOLVERS[name],
+                                  **options)
+        else:
+            solver = ENERGY_SOLVERS[name](arena, **options)
 
     logging.info("solving..")
     delay = timeit(solver.solve, number=1)
@@ -57,14 +112,119 @@ def solve(args):
     args.outfile.write(formatter(eg, solver, delay))
 
 
+def query(args, eg):
+    """ answer the question of `solve --from` """
+    from .solvers import ProgressMeasureSolver as Solver
+    from .formatters import QUERY_FORMATTERS
+    if eg.objective != "energy":
+        raise Exception("--from only works for energy games")
+    if args.outfmt not in QUERY_FORMATTERS:
+        raise Exception("out format '%s' does not work with --from"
+                        % args.outfmt)
+    solver = Solver(eg, mode=args.mode)
+
+    logging.info("querying..")
+    start = default_timer()
+    value = solver.query(args.node, args.credit)
+    delay = default_timer() - start
+    logging.info("done in %fs" % delay)
+
+    formatter = QUERY_FORMATTERS[args.outfmt]
+    args.outfile.write(formatter(args.node, args.credit, value, solver,
+                                 delay))
+
+
+def batch(args):
+    """ solve many games in parallel """
+    from .batch import run_batch
+    from .cache import ResultCache
+    cache = None
+    if args.cache:
+        cache = ResultCache(args.cache, args.cache_size << 20)
+    failed = run_batch(args.sources or ['-'], args.outfile,
+                       workers=args.workers, chunksize=args.chunksize,
+                       max_inflight=args.max_inflight, ordered=args.ordered,
+                       mode=args.mode, cache=cache)
+    if failed:
+        raise Exception("%d games could not be solved" % failed)
+
+
+def bench(args):
+    """ benchmark solvers on random games """
+    from .bench import run_bench, write_rows, read_rows, compare
+    rows = run_bench(args.solvers, args.n, args.d, args.o, args.e,
+                     range(args.seeds), repeat=args.repeat,
+                     nosinks=args.nosinks)
+    write_rows(rows, args.outfile, args.outfmt)
+    if args.baseline:
+        regressions = compare(rows, read_rows(args.baseline), args.tolerance)
+        for msg in regressions:
+            logging.warning(msg)
+        if regressions:
+            raise Exception("%d regressions" % len(regressions))
+
+
+def verify(args):
+    """ check a claimed solution of an energy game """
+    from .readers import read_game
+    from .verify import verify
+    game = read_game(args.infile)
+    if game.objective != "energy":
+        raise Exception("can only verify solutions of energy games")
+    claim = json.load(args.claim)
+    problems, unverified = verify(game, claim['win'], claim.get('opt', {}))
+    for msg in problems:
+        args.outfile.write(msg + '\n')
+    for msg in unverified:
+        args.outfile.write("unverified: " + msg + '\n')
+    if problems:
+        raise Exception("the claimed solution is wrong")
+    if unverified:
+        logging.warning("the claimed winning region checks out, but not all "
+                        "of the losing one")
+    else:
+        logging.info("the claimed solution checks out")
+
+
+def serve(args):
+    """ answer solve and convert requests on a socket """
+    from . import server
+    server.serve(args.socket, workers=args.workers)
+
+
+def forward(args):
+    """ have the command run by a server """
+    from .server import request
+    local = ('cmd', 'infile', 'outfile', 'logfile', 'verbose', 'connect')
+    options = {k: v for k, v in vars(args).items() if k not in local}
+    if options.get('cache'):
+        # the server's working directory need not be ours
+        options['cache'] = os.path.abspath(options['cache'])
+    error, output = request(args.connect, args.cmd, options,
+                            args.infile.buffer.read())
+    if error is not None:
+        raise Exception(error)
+    args.outfile.flush()
+    args.outfile.buffer.write(output)
+    args.outfile.flush()
+
+
 COMMANDS = {
+    'batch': batch,
+    'bench': bench,
     'convert': convert,
     'generate': generate,
+    'serve': serve,
     'solve': solve,
+    'verify': verify,
 }
 
 
-def main():
+def build_parser(strict=True):
+    """
+    the parser for our command line; unless `strict`, options that pick
+    from a registry take any name (see :class:`LazyChoices`)
+    """
     infile_help = "where to read from; defaults to \'-\' (stdin)"
     logfile_help = "where to log to; defaults to \'-\' (stdout)"
     outfile_help = "where to write to; defaults to \'-\' (stdout)"
@@ -78,6 +238,9 @@ def main():
     parser.add_argument('--version', action='version', version=__version__)
     parser.add_argument('-l', '--logfile', help=logfile_help,
                         type=argparse.FileType('w'), default=sys.stdout)
+    parser.add_argument('--connect', metavar='SOCKET',
+                        help='have the server listening on SOCKET run '
+                             'a solve or convert command')
     subparsers = parser.add_subparsers(title="commands", dest='cmd')
 
     # parameters for the 'convert' subcommand
@@ -88,9 +251,12 @@ def main():
                                 type=argparse.FileType('w'),
                                 default=sys.stdout)
     parser_convert.add_argument('-f', '-outfmt', dest='outfmt',
-                                choices=["pgsolver"] + list(GAME_FORMATTERS),
-                                default='eg',
-                                help='output format; defaults to \'eg\'')
+                                choices=LazyChoices(
+                                    '.formatters', 'GAME_WRITERS',
+                                    ['pgsolver'], strict),
+                                default='eg', metavar='FORMAT',
+                                help='output format, one of %(choices)s; '
+                                     'defaults to \'eg\'')
     parser_convert.add_argument('-t', '-type', dest='gametype',
                                 default='energy', choices={'energy', 'parity'},
                                 help='the type of game to reduce to')
@@ -103,9 +269,26 @@ def main():
     parser_generate.add_argument('e', type=int, help='max effect')
     parser_generate.add_argument('-s', '--nosinks', action='store_true',
                                  help='replace sinks with negative self-loops')
+    parser_generate.add_argument('--seed', type=int, default=None,
+                                 help='seed for the random number generator')
+    parser_generate.add_argument('--family', default='gnp',
+                                 choices=LazyChoices(
+                                     '.generators', 'GAME_FAMILIES',
+                                     strict=strict),
+                                 metavar='FAMILY',
+                                 help='kind of game, one of %(choices)s; '
+                                      'defaults to \'gnp\' '
+                                      '(edges with probability d)')
+    parser_generate.add_argument('-k', '--degree', type=int, default=3,
+                                 help='out-degree for the \'bounded\' and '
+                                      '\'layered\' families; defaults to 3')
     parser_generate.add_argument('-f', '-outfmt', dest='outfmt',
-                                 choices=list(GAME_FORMATTERS), default='eg',
-                                 help='output format; defaults to \'eg\'')
+                                 choices=LazyChoices(
+                                     '.formatters', 'GAME_WRITERS',
+                                     strict=strict),
+                                 default='eg', metavar='FORMAT',
+                                 help='output format, one of %(choices)s; '
+                                      'defaults to \'eg\'')
     parser_generate.add_argument('outfile', nargs='?', help=outfile_help,
                                  type=argparse.FileType('w'),
                                  default=sys.stdout)
@@ -117,16 +300,161 @@ def main():
     parser_solve.add_argument('outfile', nargs='?', help=outfile_help,
                               type=argparse.FileType('w'), default=sys.stdout)
     parser_solve.add_argument('-f', '-outfmt', dest='outfmt', default='report',
-                              choices=RESULT_FORMATTERS.keys(),
-                              help='output format; defaults to \'report\'')
+                              choices=LazyChoices(
+                                  '.formatters', 'RESULT_FORMATTERS',
+                                  strict=strict),
+                              metavar='FORMAT',
+                              help='output format, one of %(choices)s; '
+                                   'defaults to \'report\'')
+    parser_solve.add_argument('--solver', default='pm',
+                              choices=LazyChoices('.solvers', 'ENERGY_SOLVERS',
+                                                  ['auto'], strict),
+                              metavar='SOLVER',
+                              help='energy game solver, one of %(choices)s: '
+                                   'a guess by the size and effects of the '
+                                   'game, progress measure lifting or '
+                                   'strategy improvement; lifting options '
+                                   'only apply to \'pm\'; defaults to \'pm\'')
+    parser_solve.add_argument('-m', '--mode', dest='mode', default='worklist',
+                              choices=LazyChoices('.lifting', 'LIFTING_MODES',
+                                                  strict=strict),
+                              metavar='MODE',
+                              help='lifting strategy, one of %(choices)s; '
+                                   'defaults to \'worklist\'')
+    parser_solve.add_argument('-w', '--workers', type=int, default=1,
+                              help='number of lifting processes; '
+                                   'defaults to 1')
+    parser_solve.add_argument('--scc', action='store_true',
+                              help='solve strongly connected components '
+                                   'bottom-up')
+    parser_solve.add_argument('-p', '--preprocess', action='store_true',
+                              help='decide obvious vertices and collapse '
+                                   'chains before lifting')
+    parser_solve.add_argument('--cache', metavar='DIR',
+                              help='look up energy games in, and add them '
+                                   'to, a cache of results in DIR')
+    parser_solve.add_argument('--cache-size', type=int, default=256,
+                              metavar='MB',
+                              help='size of the cache in MiB; defaults to 256')
+    parser_solve.add_argument('--from', type=int, dest='node', metavar='NODE',
+                              help='only find the least credit with which '
+                                   'NODE is won, lifting only what NODE can '
+                                   'reach')
+    parser_solve.add_argument('--credit', type=int, default=None,
+                              help='with --from, only decide whether NODE is '
+                                   'won with this credit, stopping as soon '
+                                   'as it is not')
+
+    # parameters for the 'batch' subcommand
+    parser_batch = subparsers.add_parser('batch', help=batch.__doc__)
+    parser_batch.add_argument('sources', nargs='*',
+                              help='game files, directories, glob patterns '
+                                   'or json-lines files (one game per line); '
+                                   'defaults to \'-\' (json lines on stdin)')
+    parser_batch.add_argument('-o', '--outfile', help=outfile_help,
+                              type=argparse.FileType('w'), default=sys.stdout)
+    parser_batch.add_argument('-w', '--workers', type=int, default=None,
+                              help='number of worker processes; '
+                                   'defaults to the number of cpus')
+    parser_batch.add_argument('-c', '--chunksize', type=int, default=1,
+                              help='games per dispatched chunk; defaults to 1')
+    parser_batch.add_argument('--max-inflight', type=int, default=None,
+                              help='maximal number of chunks in flight; '
+                                   'defaults to twice the number of workers')
+    parser_batch.add_argument('--ordered', action='store_true',
+                              help='write results in input order rather '
+                                   'than in completion order')
+    parser_batch.add_argument('-m', '--mode', dest='mode', default='worklist',
+                              choices=LazyChoices('.lifting', 'LIFTING_MODES',
+                                                  strict=strict),
+                              metavar='MODE',
+                              help='lifting strategy, one of %(choices)s; '
+                                   'defaults to \'worklist\'')
+
+    parser_batch.add_argument('--cache', metavar='DIR',
+                              help='look up games in, and add them to, '
+                                   'a cache of results in DIR')
+    parser_batch.add_argument('--cache-size', type=int, default=256,
+                              metavar='MB',
+                              help='size of the cache in MiB; defaults to 256')
+
+    # parameters for the 'bench' subcommand
+    parser_bench = subparsers.add_parser('bench', help=bench.__doc__)
+    parser_bench.add_argument('outfile', nargs='?', help=outfile_help,
+                              type=argparse.FileType('w'), default=sys.stdout)
+    parser_bench.add_argument('-n', type=int, nargs='+', default=[100],
+                              help='numbers of nodes; defaults to 100')
+    parser_bench.add_argument('-d', type=float, nargs='+', default=[0.1],
+                              help='densities of edges; defaults to 0.1')
+    parser_bench.add_argument('-o', type=float, nargs='+', default=[0.5],
+                              help='densities of owner; defaults to 0.5')
+    parser_bench.add_argument('-e', type=int, nargs='+', default=[10],
+                              help='max effects; defaults to 10')
+    parser_bench.add_argument('--seeds', type=int, default=3,
+                              help='number of random games per combination '
+                                   'of parameters; defaults to 3')
+    parser_bench.add_argument('-s', '--nosinks', action='store_true',
+                              help='replace sinks with negative self-loops')
+    parser_bench.add_argument('--solvers', nargs='+', default=['worklist'],
+                              choices=LazyChoices('.bench', 'BENCH_SOLVERS',
+                                                  strict=strict),
+                              metavar='SOLVER',
+                              help='solvers to run, of %(choices)s; '
+                                   'defaults to \'worklist\'')
+    parser_bench.add_argument('-r', '--repeat', type=int, default=3,
+                              help='runs per game and solver; defaults to 3')
+    parser_bench.add_argument('-f', '-outfmt', dest='outfmt', default='json',
+                              choices=['json', 'csv'],
+                              help='output format; defaults to \'json\'')
+    parser_bench.add_argument('--baseline', type=argparse.FileType('r'),
+                              help='earlier results to check for regressions')
+    parser_bench.add_argument('--tolerance', type=float, default=0.2,
+                              help='relative slowdown that counts as a '
+                                   'regression; defaults to 0.2')
+
+    # parameters for the 'verify' subcommand
+    parser_verify = subparsers.add_parser('verify', help=verify.__doc__)
+    parser_verify.add_argument('infile', help='the game',
+                               type=argparse.FileType('r'))
+    parser_verify.add_argument('claim', type=argparse.FileType('r'),
+                               help='the solution in json, as written by '
+                                    '\'solve -f json\'')
+    parser_verify.add_argument('outfile', nargs='?', help=outfile_help,
+                               type=argparse.FileType('w'),
+                               default=sys.stdout)
+
+    # parameters for the 'serve' subcommand
+    parser_serve = subparsers.add_parser('serve', help=serve.__doc__)
+    parser_serve.add_argument('socket', help='path of the unix domain socket')
+    parser_serve.add_argument('-w', '--workers', type=int, default=None,
+                              help='number of worker processes; '
+                                   'defaults to the number of cpus')
+
+    return parser
+
+
+def main():
+    # a client leaves checking the names of formats etc. to the server
+    argv = sys.argv[1:]
+    strict = not any(a == '--connect' or a.startswith('--connect=')
+                     for a in argv)
+    parser = build_parser(strict)
 
     # parse arguments
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # complain if arguments clash
     if args.cmd == "convert":
         if (args.gametype, args.outfmt) == ('energy','pgsolver'):
             parser.error('out format \'pgsolver\' only works for parity games')
+        if (args.gametype, args.outfmt) == ('parity','egb'):
+            parser.error('out format \'egb\' only works for energy games')
+    if args.cmd == "solve" and args.credit is not None and args.node is None:
+        parser.error('--credit only works together with --from')
+    if args.cmd == "solve" and args.node is not None and args.solver == 'si':
+        parser.error('--from only works with solver \'pm\'')
+    if args.connect and args.cmd not in ('convert', 'solve'):
+        parser.error('only solve and convert commands can be sent to a server')
 
     # set up debug logging
     levels = [logging.WARNING, logging.INFO, logging.DEBUG]
@@ -141,7 +469,10 @@ def main():
 
     # call subcommand function
     try:
-        COMMANDS[args.cmd](args)
+        if args.connect:
+            forward(args)
+        else:
+            COMMANDS[args.cmd](args)
         sys.exit(0)
     except Exception as e:
         logging.error(e)
@@ -0,0 +1,166 @@
+# Copyright (C) 2017  Patrick Totzke <patricktotzke@gmail.com>
+# This file is released under the GNU GPL, version 3 or a later revision.
+"""
+Asynchronous lifting of a progress measure by several processes.
+
+Lifting is monotone, so chaotic iteration converges to the same least
+fixpoint no matter in which order, or how concurrently, vertices are lifted.
+The vertices are partitioned into contiguous blocks, one per worker process.
+Each worker only ever writes the measure of its own vertices, but reads and
+marks dirty any vertex, through a measure vector and dirty flags that live in
+shared memory.
+"""
+
+import copy
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import time
+import numpy as np
+
+# seconds to wait between two checks for work or termination
+POLL_INTERVAL = 0.001
+
+
+class _Shared(object):
+    """ a numpy array backed by a (new or existing) shared memory block """
+
+    def __init__(self, shape, dtype, name=None):
+        # blocks cannot be empty, and are cast to their item type as a whole
+        size = max(1, int(np.prod(shape))) * np.dtype(dtype).itemsize
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None,
+                                              size=size)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+
+    def close(self):
+        del self.array
+        self.shm.close()
+
+
+def _worker(arena, wid, lo, hi, cutoff, top, names):
+    n = len(arena)
+    pm = _Shared((n,), np.int64, names['pm'])
+    dirty = _Shared((n,), np.bool_, names['dirty'])
+    control = _Shared(names['shape'], np.int64, names['control'])
+    busy, started, stop, lifted, raised, marked = control.array
+
+    # python lists for the same reason as in lift_worklist; the shared
+    # measure and flags are accessed through memoryviews instead
+    owner = arena.owner.tolist()
+    effect = arena.effect.tolist()
+    succ, succ_ptr = arena.succ.tolist(), arena.succ_ptr.tolist()
+    pred, pred_ptr = arena.pred.tolist(), arena.pred_ptr.tolist()
+    cutoff = np.broadcast_to(cutoff, n).tolist()
+    measure = pm.shm.buf.cast('q')
+    flags = dirty.shm.buf.cast('B')
+
+    lifts = increases = enqueues = 0
+    try:
+        while not stop[0]:
+            # other workers may set flags while nonzero scans them, which
+            # makes it overrun its output; scan a private copy instead
+            todo = np.flatnonzero(dirty.array[lo:hi].copy())
+            if not len(todo):
+                busy[wid] = 0
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            # announce that we are working before touching any flag
+            busy[wid] = 1
+            started[wid] += 1
+            for v in (todo + lo).tolist():
+                flags[v] = 0
+                lifts += 1
+                demand = [measure[succ[e]] - effect[e]
+                          for e in range(succ_ptr[v], succ_ptr[v + 1])]
+                nextval = max(demand) if owner[v] else min(demand)
+                if nextval >= cutoff[v]:
+                    nextval = top
+                if nextval > measure[v]:
+                    measure[v] = nextval
+                    increases += 1
+                    for k in range(pred_ptr[v], pred_ptr[v + 1]):
+                        if measure[pred[k]] < top:
+                            flags[pred[k]] = 1
+                            enqueues += 1
+            lifted[wid], raised[wid], marked[wid] = lifts, increases, enqueues
+    finally:
+        lifted[wid], raised[wid], marked[wid] = lifts, increases, enqueues
+        measure.release()
+        flags.release()
+        del busy, started, stop, lifted, raised, marked
+        for block in (pm, dirty, control):
+            block.close()
+
+
+def lift_parallel(arena, pm, cutoff, top, workers, stats=None):
+    """
+    lift `pm` to the least fixpoint using `workers` processes.
+
+    Termination is detected by the calling process: the computation is done
+    once no worker is busy, no vertex is dirty and no worker has started a new
+    batch of lifts in between. The workers' counters are collected into
+    `stats` at the end; its hook is called while polling.
+    """
+    n = len(arena)
+    if not n:
+        return pm
+    shape = (6, workers)
+
+    # balance the blocks by number of edges rather than number of vertices
+    m = arena.number_of_edges()
+    cuts = np.searchsorted(arena.succ_ptr[:-1],
+                           np.linspace(0, m, workers + 1)[1:-1])
+    cuts = [0] + cuts.tolist() + [n]
+
+    shared_pm = _Shared((n,), np.int64)
+    dirty = _Shared((n,), np.bool_)
+    control = _Shared(shape, np.int64)
+    names = {'pm': shared_pm.shm.name, 'dirty': dirty.shm.name,
+             'control': control.shm.name, 'shape': shape}
+    try:
+        shared_pm.array[:] = pm
+        dirty.array[:] = (arena.out_degree() > 0) & (pm < top)
+        control.array[:] = 0
+        control.array[0] = 1  # everyone is busy until told otherwise
+        busy, started, stop, counters = 0, 1, 2, slice(3, None)
+        saturated = np.count_nonzero(pm == top)
+        sampling = stats is not None and stats.hook is not None
+        next_sample = stats.every if sampling else 0
+
+        procs = [mp.Process(target=_worker,
+                            args=(arena, w, cuts[w], cuts[w + 1],
+                                  cutoff, top, names))
+                 for w in range(workers)]
+        for p in procs:
+            p.start()
+
+        try:
+            while True:
+                time.sleep(POLL_INTERVAL)
+                if any(p.exitcode for p in procs):
+                    raise RuntimeError("a lifting worker died")
+                if sampling:
+                    done = control.array[counters].sum(axis=1).tolist()
+                    if done[0] >= next_sample:
+                        probe = copy.copy(stats)
+                        probe.count(*done)
+                        probe.sample()
+                        next_sample = done[0] + stats.every
+                before = control.array[started].sum()
+                if control.array[busy].any() or dirty.array.any():
+                    continue
+                if control.array[started].sum() == before:
+                    break
+        finally:
+            control.array[stop, 0] = 1
+            for p in procs:
+                p.join()
+        pm[:] = shared_pm.array
+        if stats is not None:
+            stats.count(*control.array[counters].sum(axis=1).tolist(),
+                        saturations=np.count_nonzero(pm == top) - saturated)
+    finally:
+        for block in (shared_pm, dirty, control):
+            block.close()
+            block.shm.unlink()
+    return pm
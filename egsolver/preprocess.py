@@ -0,0 +1,143 @@
+# Copyright (C) 2017  Patrick Totzke <patricktotzke@gmail.com>
+# This file is released under the GNU GPL, version 3 or a later revision.
+"""
+Shrink an energy game before lifting a progress measure on it.
+
+Some vertices can be decided right away: player 1 can force a play from
+its attractor to the sinks and to its negative traps either into a sink or
+to lose energy on every single step, so these are losing (top), while
+player 0 can keep a play in the greatest set of vertices in which only
+non-negative edges are ever taken, so these need no initial credit (0).
+
+Of the remaining vertices, maximal chains of vertices with a single
+predecessor and a single successor are collapsed into one edge with the
+summed effect, as long as no proper prefix of the chain has a negative sum,
+which would make the chain ask for more credit than its endpoints show.
+"""
+
+import numpy as np
+
+from .arenas import EnergyArena, segments
+
+
+def _restrict(arena, keep):
+    """ the arena with only the edges in the mask `keep` """
+    return EnergyArena(arena.nodes, arena.owner,
+                       np.concatenate([[0], np.cumsum(np.bincount(
+                           arena.src[keep], minlength=len(arena)))]),
+                       arena.succ[keep], arena.effect[keep])
+
+
+def losing_region(arena):
+    """
+    the vertices from which player 1 can force either a sink or a play in
+    which every edge is negative, as a boolean mask.
+
+    The negative trap is the greatest set of vertices in which player 1 has
+    a negative edge back into the set and all edges of player 0 are negative
+    ones into the set; every step inside it costs energy, so no initial
+    credit suffices.
+    """
+    sinks = arena.out_degree() == 0
+    negative = arena.effect < 0
+    trap = _restrict(arena, negative)
+    nonneg = np.bincount(arena.src[~negative], minlength=len(arena)) > 0
+    escape = np.where(arena.owner == 0, nonneg,
+                      (trap.out_degree() == 0) & ~sinks)
+    return arena.attractor(1, ~trap.attractor(0, escape))
+
+
+def decided_regions(arena):
+    """
+    the losing and the winning vertices that are obvious, as a pair of
+    boolean masks: the :func:`losing_region`, and the greatest set of vertices
+    from which player 0 can stay in the set forever using only non-negative
+    edges
+    """
+    sinks = arena.out_degree() == 0
+    losing = losing_region(arena)
+
+    # player 1 escapes from the winning set along any negative edge, player 0
+    # needs at least one non-negative one; vertices that violate this and
+    # all those player 1 can force there are not safe
+    nonneg = arena.effect >= 0
+    safe = _restrict(arena, nonneg)
+    negative = np.bincount(arena.src[~nonneg], minlength=len(arena)) > 0
+    unsafe = np.where(arena.owner == 1, negative, safe.out_degree() == 0)
+    winning = ~safe.attractor(1, unsafe | sinks)
+    return losing, winning & ~losing
+
+
+def chains(arena, alive):
+    """
+    find collapsible chains in the subgame `alive`.
+
+    Returns a mask of the vertices on collapsed chains and, for every
+    chain's head, the vertex at its end and the summed effect of the path
+    from the head's predecessor there.
+    """
+    n = len(arena)
+    inner = alive & (np.diff(arena.pred_ptr) == 1) & (arena.out_degree() == 1)
+    vs = np.flatnonzero(inner)
+    heads = vs[~inner[arena.pred[arena.pred_ptr[vs]]]]
+
+    # walk along every chain; each inner vertex is visited once
+    succ, succ_ptr = arena.succ.tolist(), arena.succ_ptr.tolist()
+    effect = arena.effect.tolist()
+    pred_edge = arena.pred_edge.tolist()
+    pred_ptr = arena.pred_ptr.tolist()
+    isinner = inner.tolist()
+    collapsed = np.zeros(n, dtype=np.bool_)
+    ends, totals, found = [], [], []
+    for h in heads.tolist():
+        total = effect[pred_edge[pred_ptr[h]]]
+        ok = total >= 0
+        path = []
+        v = h
+        while ok and isinner[v]:
+            path.append(v)
+            total += effect[succ_ptr[v]]
+            v = succ[succ_ptr[v]]
+            ok = not isinner[v] or total >= 0
+        if ok and path:
+            collapsed[path] = True
+            found.append(h)
+            ends.append(v)
+            totals.append(total)
+    return (collapsed, np.array(found, dtype=np.int64),
+            np.array(ends, dtype=np.int64), np.array(totals, dtype=np.int64))
+
+
+def reduce(arena, top):
+    """
+    shrink `arena` by deciding the obvious vertices and collapsing chains.
+
+    Returns the initial measure for `arena`, in which decided vertices
+    already have their final value (top or 0), and the reduced game as a
+    pair of a sub-arena and the indices of its vertices in `arena`, like
+    :meth:`~egsolver.arenas.EnergyArena.subarena`: the undecided vertices
+    that were not collapsed come first, followed by decided vertices that
+    they lead to, which keep their value and have no edges. Last comes the
+    mask of the collapsed vertices, whose values are still to be found.
+    """
+    losing, winning = decided_regions(arena)
+    pm = np.zeros(len(arena), dtype=np.int64)
+    pm[losing] = top
+    alive = ~(losing | winning)
+
+    collapsed, heads, ends, totals = chains(arena, alive)
+    vs = np.flatnonzero(alive & ~collapsed)
+
+    # edges into the head of a collapsed chain skip to its end
+    edges, _ = segments(arena.succ_ptr, vs)
+    targets, effect = arena.succ[edges], arena.effect[edges]
+    skip = np.full(len(arena), -1, dtype=np.int64)
+    skip[heads] = np.arange(len(heads))
+    into = skip[targets]
+    hit = into >= 0
+    targets[hit] = ends[into[hit]]
+    effect[hit] = totals[into[hit]]
+
+    # decided successors become vertices without edges
+    sub, keep = arena.subarena(vs, targets, effect)
+    return pm, sub, keep, collapsed
@@ -0,0 +1,291 @@
+# Copyright (C) 2017  Patrick Totzke <patricktotzke@gmail.com>
+# This file is released under the GNU GPL, version 3 or a later revision.
+
+from array import array
+from itertools import islice
+import json
+import os
+import numpy as np
+
+from .arenas import EnergyArena, ParityArena, indexer
+
+# the binary 'egb' format starts with this magic number, followed by the
+# number of nodes n and edges m as little endian 64 bit integers, and then
+# the arrays of node ids (int64[n]), owners (int8[n]), CSR offsets
+# (int64[n+1]), edge targets (int64[m]) and effects (int64[m]).
+# Every array is padded with zeros to a multiple of 8 bytes.
+EGB_MAGIC = b'EGSOLVB1'
+EGB_LAYOUT = (
+    ('nodes', '<i8', 0),
+    ('owner', 'i1', 0),
+    ('succ_ptr', '<i8', 1),
+    ('succ', '<i8', None),
+    ('effect', '<i8', None),
+)
+
+
+def read_egb(source):
+    """
+    load an energy game stored in the binary 'egb' format.
+
+    :param source: name of a file, which gets memory-mapped, or bytes
+    :rtype: :class:`~egsolver.arenas.EnergyArena`
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        buf = np.frombuffer(source, dtype=np.uint8)
+    else:
+        buf = np.memmap(source, dtype=np.uint8, mode='r')
+    if bytes(buf[:len(EGB_MAGIC)]) != EGB_MAGIC:
+        raise ValueError("not a game in egb format")
+    n, m = buf[8:24].view('<i8').tolist()
+
+    arrays = {}
+    offset = 24
+    for name, dtype, extra in EGB_LAYOUT:
+        count = m if extra is None else n + extra
+        size = count * np.dtype(dtype).itemsize
+        if offset + size > len(buf):
+            raise ValueError("truncated egb game")
+        arrays[name] = buf[offset:offset + size].view(dtype)
+        offset += size + (-size % 8)
+    return EnergyArena(**arrays)
+
+
+class _JSONStream(object):
+    """
+    incremental reader of json text from a file object.
+
+    Only a bounded window of the input is kept in memory, so that large
+    arrays can be consumed one element at a time.
+    """
+    decoder = json.JSONDecoder()
+
+    def __init__(self, infile, chunksize=1 << 16):
+        self.infile = infile
+        self.chunksize = chunksize
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """ read another chunk, dropping what has been consumed already """
+        chunk = self.infile.read(self.chunksize)
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        self.eof = not chunk
+        return not self.eof
+
+    def peek(self):
+        """ the next non-whitespace character, without consuming it """
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buf) or not self.fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, chars):
+        c = self.peek()
+        if not c or c not in chars:
+            raise ValueError("invalid game: expected %s but got %r"
+                             % (" or ".join(chars), c or "end of input"))
+        self.pos += 1
+        return c
+
+    def value(self):
+        """ decode the next complete json value """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                if self.fill():
+                    continue
+                raise
+            # a number may continue in the next chunk
+            if end == len(self.buf) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def items(self):
+        """ iterate over the elements of a json array """
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+
+def read_eg_stream(infile):
+    """
+    read an energy game in the json based 'eg' format from a file object.
+
+    The nodes and edges arrays are parsed element by element straight into
+    flat array buffers, so the document is never held in memory as a whole.
+    Node ids must therefore be integers that fit into 64 bits, or a
+    `ValueError` is raised. Repeated edges between the same two nodes are
+    merged into one, with the effect given last.
+
+    :rtype: :class:`~egsolver.arenas.EnergyArena`
+    """
+    stream = _JSONStream(infile)
+    nodes, owner = array('q'), array('b')
+    source, target, effect = array('q'), array('q'), array('q')
+
+    stream.expect('{')
+    if stream.peek() == '}':
+        stream.pos += 1
+    else:
+        while True:
+            key = stream.value()
+            stream.expect(':')
+            if key == 'nodes':
+                for v in stream.items():
+                    try:
+                        nodes.append(v['id'])
+                    except (TypeError, OverflowError):
+                        raise ValueError("node id %r is not a 64 bit integer"
+                                         % (v['id'],))
+                    owner.append(v['owner'])
+            elif key == 'edges':
+                for e in stream.items():
+                    try:
+                        source.append(e['source'])
+                        target.append(e['target'])
+                    except (TypeError, OverflowError):
+                        raise ValueError("edge %r -> %r refers to a node id "
+                                         "that is not a 64 bit integer"
+                                         % (e['source'], e['target']))
+                    effect.append(e['effect'])
+            else:
+                stream.value()
+            if stream.expect(',}') == '}':
+                break
+    source, target, effect = _merge_repeated(
+        *(np.frombuffer(a, dtype=np.int64) for a in (source, target, effect)))
+    return EnergyArena.from_edges(nodes, owner, source, target, effect)
+
+
+def _merge_repeated(source, target, effect):
+    """
+    drop all but one of the edges between the same pair of nodes: it stays
+    where the first was given, with the effect of the last, as when adding
+    them to a networkx graph one by one
+    """
+    order = np.lexsort((target, source))
+    s, t = source[order], target[order]
+    repeat = (s[1:] == s[:-1]) & (t[1:] == t[:-1])
+    if not repeat.any():
+        return source, target, effect
+    start = np.flatnonzero(np.concatenate([[True], ~repeat]))
+    end = np.append(start[1:], len(order)) - 1
+    first, last = order[start], order[end]
+    keep = np.argsort(first)
+    return (source[first[keep]], target[first[keep]],
+            effect[last[keep]])
+
+
+# number of lines that :func:`read_pgsolver` parses at once
+PGSOLVER_CHUNK = 1 << 16
+
+
+def _pgsolver_fields(line):
+    """
+    split the description of a vertex in pgsolver format into its id,
+    priority, owner, successors and label
+    """
+    fields = line.strip().rstrip(';').split(None, 3)
+    if len(fields) < 3:
+        raise ValueError("invalid pgsolver line: %r" % line)
+    rest = fields[3] if len(fields) > 3 else ''
+    if rest.startswith('"'):
+        return fields[:3] + ['', rest]
+    succs, _, label = rest.partition(' ')
+    return fields[:3] + [succs, label]
+
+
+def _pgsolver_label(raw):
+    return raw.strip().rstrip(';').strip().strip('"')
+
+
+def read_pgsolver(infile):
+    """
+    read a parity game in pgsolver format from a (text) file object.
+
+    Every line describes one vertex as `id priority owner successors
+    ["label"];` with comma separated successor ids. Lines are split a
+    chunk at a time and their columns converted to arrays in bulk; labels
+    are only cleaned up when asked for.
+
+    :rtype: :class:`~egsolver.arenas.ParityArena`
+    """
+    columns = [], [], []
+    degree, succ, labels = [], [], []
+
+    lines = iter(infile)
+    while True:
+        chunk = list(islice(lines, PGSOLVER_CHUNK))
+        if not chunk:
+            break
+        rows = []
+        for line in chunk:
+            fields = line.split(None, 4)
+            if not fields or fields[0] in ('parity', 'start'):
+                continue
+            # the common case is 'id prio owner succs "label";'
+            if len(fields) != 5 or fields[3].startswith('"'):
+                fields = _pgsolver_fields(line)
+            rows.append(fields)
+        if not rows:
+            continue
+        v, p, o, succs, raw = zip(*rows)
+        for column, strings in zip(columns, (v, p, o)):
+            column.append(" ".join(strings))
+        succs = [t.rstrip(';') for t in succs]
+        degree.extend(t.count(',') + 1 if t else 0 for t in succs)
+        succ.append(",".join(t for t in succs if t))
+        labels.extend(raw)
+
+    def parse(strings, sep):
+        text = sep.join(t for t in strings if t)
+        if not text:
+            return np.zeros(0, dtype=np.int64)
+        return np.fromstring(text, dtype=np.int64, sep=sep)
+
+    nodes, priority, owner = (parse(column, ' ') for column in columns)
+    succ = parse(succ, ',')
+    succ_ptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+    np.cumsum(degree, out=succ_ptr[1:])
+    if not (len(nodes) == len(priority) == len(owner) == len(labels)) \
+            or len(succ) != succ_ptr[-1]:
+        raise ValueError("invalid game in pgsolver format")
+
+    def label(lo, hi):
+        return [_pgsolver_label(raw) or str(v) for raw, v in
+                zip(labels[lo:hi], nodes[lo:hi].tolist())]
+    return ParityArena(nodes, owner, succ_ptr, indexer(nodes)(succ),
+                       priority, label)
+
+
+def read_game(infile):
+    """
+    read a game from a (text) file object, either an energy game in the
+    json based 'eg' format or in the binary 'egb' format, which is
+    recognised by its magic number, or a parity game in pgsolver format,
+    which starts with 'parity'. Regular 'egb' files are memory-mapped rather
+    than read.
+    """
+    buffer = getattr(infile, 'buffer', None)
+    if buffer is not None and hasattr(buffer, 'peek'):
+        head = buffer.peek(len(EGB_MAGIC))
+        if head[:len(EGB_MAGIC)] == EGB_MAGIC:
+            name = getattr(infile, 'name', None)
+            if isinstance(name, str) and os.path.isfile(name):
+                return read_egb(name)
+            return read_egb(buffer.read())
+        if head.lstrip().startswith(b'parity'):
+            return read_pgsolver(infile)
+    return read_eg_stream(infile)
@@ -3,51 +3,114 @@
 
 import logging
 import numpy as np
-import networkx as nx
-from .games import ParityGame
+
+from .arenas import EnergyArena, ParityArena, blocks_to_parity_game
+
+
+class EnergyParityView(object):
+    """
+    Implicit parity game that an energy game reduces to.
+
+    Its vertices are pairs of an energy game vertex `s` and an energy level
+    `n` between `bottom` and `top`, numbered level by level, that is, pair
+    `(s, n)` gets id `(n - bottom) * len(arena) + s`. Vertices on the bottom
+    level have priority 0 and those on the top level have priority 1; both
+    only have a self-loop. All others have priority 1 and move along the edges
+    of the energy game, shifting the level by the edge's effect (clamped to
+    `bottom` and `top`).
+
+    Nothing is materialized: successors are computed on demand, and
+    :meth:`blocks` generates the game one level at a time as arrays.
+    """
+    objective = "parity"
+
+    def __init__(self, arena, initial_credit=0):
+        if not isinstance(arena, EnergyArena):
+            arena = EnergyArena.from_energy_game(arena)
+        self.arena = arena
+        n = len(arena)
+        m = arena.number_of_edges()
+        maxeffect = int(np.abs(arena.effect).max()) if m else 0
+        self.top = maxeffect * n + 1
+        self.bottom = -(initial_credit or self.top)
+        self.levels = self.top - self.bottom + 1
+        self.size = n
+
+    def number_of_nodes(self):
+        return self.size * self.levels
+
+    def number_of_edges(self):
+        inner = self.levels - 2
+        return 2 * self.size + inner * self.arena.number_of_edges()
+
+    def state(self, v):
+        """ the energy game vertex index and level of vertex `v` """
+        level, s = divmod(v, self.size)
+        return s, self.bottom + level
+
+    def owner(self, v):
+        s, n = self.state(v)
+        return int(self.arena.owner[s]) if self.bottom < n < self.top else 0
+
+    def priority(self, v):
+        return 0 if self.state(v)[1] == self.bottom else 1
+
+    def label(self, v):
+        s, n = self.state(v)
+        return "{}({})".format(self.arena.nodes[s], n)
+
+    def successors(self, v):
+        s, n = self.state(v)
+        if n in (self.bottom, self.top):
+            return [v]
+        lo, hi = self.arena.succ_ptr[s], self.arena.succ_ptr[s + 1]
+        return self._targets(n, lo, hi).tolist()
+
+    def _targets(self, n, lo=None, hi=None):
+        arena = self.arena
+        levels = np.clip(n + arena.effect[lo:hi], self.bottom, self.top)
+        return (levels - self.bottom) * self.size + arena.succ[lo:hi]
+
+    def block(self, n):
+        """
+        the vertices on level `n` as a tuple of node ids, owners,
+        priorities, CSR offsets, successor node ids and labels
+        """
+        arena = self.arena
+        size = self.size
+        ids = (n - self.bottom) * size + np.arange(size, dtype=np.int64)
+        labels = ["{}({})".format(s, n) for s in arena.nodes.tolist()]
+        if n in (self.bottom, self.top):
+            return (ids, np.zeros(size, dtype=np.int8),
+                    np.full(size, int(n == self.top), dtype=np.int64),
+                    np.arange(size + 1, dtype=np.int64), ids, labels)
+        return (ids, arena.owner, np.ones(size, dtype=np.int64),
+                arena.succ_ptr, self._targets(n), labels)
+
+    def blocks(self):
+        for n in range(self.bottom, self.top + 1):
+            yield self.block(n)
+
+    def to_parity_arena(self):
+        """ materialize the whole parity game as a `ParityArena` """
+        ids, owner, priority, ptrs, succ, labels = zip(*self.blocks())
+        offsets = np.cumsum([0] + [p[-1] for p in ptrs])
+        succ_ptr = np.concatenate(
+            [p[:-1] + o for p, o in zip(ptrs, offsets)] + [offsets[-1:]])
+        names = [label for block in labels for label in block]
+        return ParityArena(np.concatenate(ids), np.concatenate(owner),
+                           succ_ptr, np.concatenate(succ),
+                           np.concatenate(priority),
+                           label=lambda lo, hi: names[lo:hi])
+
+    def to_parity_game(self):
+        """ materialize the whole parity game as a `ParityGame` """
+        return blocks_to_parity_game(self)
 
 
 def energy_to_parity(eg, initial_credit=0):
     """ reduce an energy game to a parity game """
-    priority = {}
-    initial_credit = initial_credit
-
-    p = ParityGame()
-    number_of_states = len(eg.nodes())
-
-    em = nx.to_numpy_matrix(eg, weight="effect")
-    maxeffect =  int(np.max(np.abs(em)))
-
-    top = maxeffect * number_of_states +1
-    bottom = -(initial_credit or top)
-
-    nid = 0
-    egnode_of = {}
-    pgnode_of = {}
-    for n in range(bottom,top+1):
-        for s in eg.nodes():
-
-            egnode_of[nid] = (s,n)
-            pgnode_of[(s,n)] = nid
-            label = "{}({})".format(s,n)
-
-            if n == bottom:
-                owner = eg.node[s]['owner']
-                priority = 0
-                p.add_node(nid, owner=0, priority=0, label=label)
-                p.add_edge(nid, nid)
-            elif n == top:
-                p.add_node(nid, owner=0, priority=1, label=label)
-                p.add_edge(nid, nid)
-            else:
-                o = eg.node[s]['owner']
-                p.add_node(nid, owner=o, priority=1, label=label)
-
-            nid += 1
-
-    for n in range(bottom+1,top):
-        for (s,t) in eg.edges():
-            m = max(min(n+eg.effect((s,t)), top), bottom)
-            p.add_edge(pgnode_of[(s,n)], pgnode_of[(t,m)])
-    logging.debug("Parity Game:\n %s" % p.to_pgsolver_format())
+    p = EnergyParityView(eg, initial_credit).to_parity_game()
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("Parity Game:\n %s" % p.to_pgsolver_format())
     return p
@@ -0,0 +1,126 @@
+# Copyright (C) 2017  Patrick Totzke <patricktotzke@gmail.com>
+# This file is released under the GNU GPL, version 3 or a later revision.
+"""
+Serve solve and convert requests on a Unix domain socket.
+
+Starting `egsolver` imports numpy and networkx before it even reads its
+input, which dominates the time taken for small games. A server pays for
+this once: its requests are handled in threads and run by a pool of worker
+processes that have imported everything at startup.
+
+A request is a line of json, holding the command and its options (the
+parsed command line arguments but the files), followed by the input game in
+any format that :func:`~egsolver.readers.read_game` understands. The client
+then shuts down its side of the connection. The answer is a line of json,
+whose 'error' is null unless the command failed, followed by the output.
+"""
+
+import argparse
+import io
+import json
+import logging
+import multiprocessing as mp
+import os
+import signal
+import socket
+import socketserver
+
+# the commands that a server runs
+SERVED_COMMANDS = ('convert', 'solve')
+
+
+def _warm():
+    """ import everything that requests may need, once per worker """
+    # interrupts are for the server, which then terminates its workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import networkx
+    from . import formatters, main, readers, reductions, solvers
+
+
+def run_command(cmd, options, payload):
+    """
+    run the subcommand `cmd` of :mod:`egsolver.main` with the given options
+    on an input game given as bytes.
+
+    :returns: a pair of an error message (None on success) and the output
+    """
+    from .main import COMMANDS
+    infile = io.TextIOWrapper(io.BufferedReader(io.BytesIO(payload)))
+    output = io.BytesIO()
+    outfile = io.TextIOWrapper(output, write_through=True)
+    args = argparse.Namespace(cmd=cmd, infile=infile, outfile=outfile,
+                              **options)
+    try:
+        COMMANDS[cmd](args)
+        outfile.flush()
+    except Exception as e:
+        return str(e) or repr(e), b''
+    return None, output.getvalue()
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        request = json.loads(self.rfile.readline().decode('utf-8'))
+        payload = self.rfile.read()
+        cmd, options = request['cmd'], request['options']
+        if cmd not in SERVED_COMMANDS:
+            error, output = "cannot serve command '%s'" % cmd, b''
+        elif options.get('workers', 1) != 1:
+            # pool workers cannot have lifting processes of their own
+            error, output = "served solves use a single process", b''
+        else:
+            error, output = self.server.pool.apply(
+                run_command, (cmd, options, payload))
+        logging.info("%s: %s" % (cmd, error or "%d bytes" % len(output)))
+        self.wfile.write(json.dumps({'error': error}).encode('utf-8') + b'\n')
+        self.wfile.write(output)
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, workers=None):
+        if os.path.exists(path):
+            os.unlink(path)
+        socketserver.ThreadingUnixStreamServer.__init__(self, path,
+                                                        RequestHandler)
+        self.pool = mp.Pool(workers, initializer=_warm)
+
+    def server_close(self):
+        socketserver.ThreadingUnixStreamServer.server_close(self)
+        self.pool.terminate()
+        self.pool.join()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def serve(path, workers=None):
+    """
+    answer requests on the Unix domain socket `path` until interrupted or
+    terminated, with `workers` processes (defaults to the number of cpus)
+    """
+    with Server(path, workers) as server:
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        logging.info("serving on %s" % path)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def request(path, cmd, options, payload):
+    """
+    send a request to the server listening on the socket `path`
+
+    :returns: a pair of an error message (None on success) and the output
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        header = json.dumps({'cmd': cmd, 'options': options})
+        sock.sendall(header.encode('utf-8') + b'\n')
+        sock.sendall(payload)
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile('rb') as answer:
+            error = json.loads(answer.readline().decode('utf-8'))['error']
+            return error, answer.read()
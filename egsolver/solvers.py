@@ -1,41 +1,125 @@
 # Copyright (C) 2017  Patrick Totzke <patricktotzke@gmail.com>
 # This file is released under the GNU GPL, version 3 or a later revision.
 
+import copy
+from fractions import Fraction
 import logging
-import networkx as nx
+import multiprocessing as mp
 import numpy as np
 
+from .arenas import Arena, EnergyArena, ParityArena, segments
+from .lifting import LIFTING_MODES
+from .parallel import lift_parallel
+from .preprocess import losing_region, reduce
+from .stats import SolverStats
+
 
 class Solver(object):
-    """ Solver base class """
+    """
+    Solver base class.
 
-    def __init__(self, eg):
+    Counters and the time spent in the phases of solving are collected in
+    :attr:`stats`, a :class:`~egsolver.stats.SolverStats`.
+    """
+
+    def __init__(self, eg, stats=None):
         self.game = eg
+        self.stats = stats or SolverStats()
+        self.values = None
+        self._strategy = None
+        with self.stats.phase('setup'):
+            if isinstance(eg, Arena):
+                self.arena = eg
+            else:
+                self.arena = EnergyArena.from_energy_game(eg)
         self.win = {}
 
     def solve(self):
         return self.win
 
-    def optimal_strategy(self):
-        eg = self.game
-        win = self.win
-        effect = self.game.effect
-        playernodes = eg.playernodes(0)
-
-        if win:
-            def opt_succ(v):
-                # get all winning successor nodes
-                winsuccs = [t for t in eg.successors(v) if win[t] >= 0]
-
-                # pick the one where its value after getting there is minimal
-                def needs_energy(t):
-                    return win[t] - effect((v, t))
-                return min(winsuccs, key=needs_energy)
-            opt = {v: opt_succ(v) for v in playernodes if win[v] >= 0}
-        else:
-            opt = {}
+    def optimal_strategy(self, as_array=False):
+        """
+        an optimal strategy for player 0 on its winning region, as a dict
+        from node ids to node ids or, if `as_array` is set, as an array that
+        maps every vertex index to the index of its successor (or -1).
+
+        The strategy is computed once per winning region, i.e., it is cached
+        until :attr:`win` changes.
+        """
+        if self._strategy is None or self._strategy[0] is not self.win:
+            with self.stats.phase('strategy'):
+                self._strategy = (self.win, self.strategy_array())
+        opt = self._strategy[1]
+        if as_array:
+            return opt
+        vs = np.flatnonzero(opt >= 0)
+        nodes = self.arena.nodes
+        return dict(zip(nodes[vs].tolist(), nodes[opt[vs]].tolist()))
+
+    def winning_values(self):
+        """ the values in :attr:`win` as an array over vertex indices """
+        if self.values is not None:
+            return self.values
+        return np.fromiter(map(self.win.get, self.arena.nodes.tolist()),
+                           dtype=np.int64, count=len(self.arena))
+
+    def strategy_array(self):
+        """
+        pick, for every winning vertex of player 0, the winning successor
+        where the value after getting there is minimal; ties go to the
+        first such edge
+        """
+        if not self.win:
+            return np.full(len(self.arena), -1, dtype=np.int64)
+        return energy_strategy(self.arena, self.winning_values())
+
+
+def _argbest(values, starts, lens, reduce):
+    """
+    reduce (with `np.minimum` or `np.maximum`) the `values` over consecutive
+    non-empty segments with the given starts and lengths; returns the
+    results and the index of the first value in every segment that attains
+    its result
+    """
+    best = reduce.reduceat(values, starts)
+    which = np.repeat(np.arange(len(starts)), lens)
+    hits = np.flatnonzero(values == best[which])
+    _, first = np.unique(which[hits], return_index=True)
+    return best, hits[first]
+
+
+def energy_strategy(arena, win):
+    """
+    the optimal strategy of player 0 for the progress measure `win` on
+    `arena`, in which losing vertices are negative, see
+    :meth:`Solver.strategy_array`
+    """
+    opt = np.full(len(arena), -1, dtype=np.int64)
+    vs = np.flatnonzero((arena.owner == 0) & (win >= 0)
+                        & (arena.out_degree() > 0))
+    if not len(vs):
         return opt
 
+    edges, starts = segments(arena.succ_ptr, vs)
+    targets = arena.succ[edges]
+    needs_energy = win[targets] - arena.effect[edges]
+    needs_energy[win[targets] < 0] = np.iinfo(np.int64).max
+
+    _, first = _argbest(needs_energy, starts, arena.out_degree()[vs],
+                        np.minimum)
+    opt[vs] = targets[first]
+    return opt
+
+
+# components with fewer vertices are lifted in-process even if there is a pool
+POOL_THRESHOLD = 1000
+
+
+def _lift_component(task):
+    lift, sub, pm, size, cutoff, top, stats = task
+    lift(sub, pm, cutoff, top, stats)
+    return pm[:size], stats
+
 
 class ProgressMeasureSolver(Solver):
     """
@@ -47,89 +131,790 @@ class ProgressMeasureSolver(Solver):
         Form Methods Syst Des (2011) 38: 97.
         :doi:`10.1007/s10703-010-0105-x`
 
-    Progress measures, state sets, and weight/adjacency matrices
-    are represented directly in numpy.
+    Progress measures and state sets are represented directly in numpy,
+    the game itself as an :class:`~egsolver.arenas.EnergyArena`, so that
+    memory and the cost of a single lift are linear in the number of edges.
+
+    The `mode` selects one of the :data:`~egsolver.lifting.LIFTING_MODES`:
+    'worklist' lifts one vertex at a time, 'jacobi' lifts all dirty vertices
+    at once using vectorized segment reductions. With more than one of
+    `workers`, vertices are instead lifted asynchronously by that many
+    processes sharing the measure. All of these compute the same least
+    fixpoint.
+
+    If `scc` is set, the game is instead decomposed into strongly connected
+    components which are solved bottom-up, see :meth:`lift_components`.
+    If `preprocess` is set, the game is shrunk before lifting, see
+    :meth:`lift_reduced`.
+
+    With `local_cutoffs`, every vertex is cut off at its own bound from
+    :meth:`~egsolver.arenas.EnergyArena.credit_bounds` rather than at the
+    global sum of all drops, so that losing vertices saturate much earlier.
     """
 
+    def __init__(self, eg, mode='worklist', workers=1, scc=False,
+                 stats=None, preprocess=False, local_cutoffs=True):
+        Solver.__init__(self, eg, stats)
+        self.lift = LIFTING_MODES[mode]
+        self.workers = workers
+        self.scc = scc
+        self.preprocess = preprocess
+        self.local_cutoffs = local_cutoffs
+
+    def bounds(self, arena=None):
+        """
+        compute the cutoff above which a measure is considered infinite,
+        a number or an array with one per vertex, and the top element that
+        represents such measures, for the game or the given part of it
+        """
+        if arena is None:
+            arena = self.arena
+        effect = arena.effect
+        maxinc = max(0, int(effect.max())) if len(effect) else 0
+        cutoff = arena.cutoff()
+        top = cutoff + maxinc
+        if self.local_cutoffs and not self.scc:
+            cutoff = arena.credit_bounds() + 1
+        return cutoff, top
+
+    def initial_measure(self, cutoff, top):
+        """
+        the measure to start lifting from; the vertices of the
+        :func:`~egsolver.preprocess.losing_region`, which include all sinks,
+        start at top
+        """
+        pm = np.zeros(len(self.arena), dtype=np.int64)
+        pm[losing_region(self.arena)] = top
+        return pm
+
+    def remember(self, pm, top):
+        """
+        remember and return the progress measure = winning region
+        """
+        self.values = np.where(pm == top, -1, pm)
+        self.win = dict(zip(self.arena.nodes.tolist(), self.values.tolist()))
+        return self.win
+
     def solve(self):
-        # some shorthands
-        eg = self.game
-        n = nx.number_of_nodes(eg)
-        owner = nx.get_node_attributes(eg, 'owner')
+        arena = self.arena
 
-        # get adjacency matrix and a weight matrix with non-edges masked
-        adj = nx.to_numpy_matrix(eg, nonedge=0, weight=None).astype(np.bool)
-        weightmatrix = nx.to_numpy_matrix(eg, weight="effect").astype(np.int)
-        weightmatrix = np.ma.array(weightmatrix, mask=np.invert(adj))
-        # TODO: don't use masked arrays, apparently they are slow
+        stats = self.stats
 
         # compute top element above wich we cut off
-        em = nx.to_numpy_matrix(eg, weight="effect")
-        maxinc = np.max(em)
+        with stats.phase('cutoff'):
+            cutoff, top = self.bounds()
+        logging.debug("CUTOFF = %d" % np.max(cutoff, initial=0))
+        logging.debug("TOP = %d" % top)
 
-        def maxdrop_from(src):
-            return -np.min(em[src])
+        if self.preprocess:
+            pm = self.lift_reduced(cutoff, top)
+            return self.remember(pm, top)
 
-        cutoff = sum(maxdrop_from(v) for v in eg) + 1
-        logging.debug("CUTOFF = %d" % cutoff)
-        top = cutoff + maxinc
-        logging.debug("TOP = %d" % top)
+        with stats.phase('lifting'):
+            pm = self.initial_measure(cutoff, top)
+            if self.scc:
+                self.lift_components(pm, top)
+            elif self.workers > 1:
+                lift_parallel(arena, pm, cutoff, top, self.workers, stats)
+            else:
+                self.lift(arena, pm, cutoff, top, stats)
+        return self.remember(pm, top)
+
+    def query(self, node, credit=None):
+        """
+        the least credit with which player 0 wins from `node`, or -1 if it
+        loses. If a `credit` is given, the question is only whether that
+        suffices: the least credit is returned if it is at most `credit`,
+        and -1 otherwise.
+
+        Only the part of the game reachable from `node` is lifted, in this
+        process, and lifting stops as soon as the measure of `node` reaches
+        top. Its cutoff is lowered to `credit` + 1; this can only raise the
+        least fixpoint, and it changes the measure of `node` only if that
+        needs more than `credit` anyway.
+        """
+        arena, stats = self.arena, self.stats
+        index = np.flatnonzero(arena.nodes == node)
+        if not len(index):
+            raise ValueError("unknown node %s" % node)
+        if credit is not None and credit < 0:
+            raise ValueError("credit must not be negative")
+
+        with stats.phase('cutoff'):
+            reach = arena.reachable(index)
+            if reach.all():
+                sub, v = arena, int(index[0])
+            else:
+                sub, vs = arena.induced(reach)
+                v = int(np.searchsorted(vs, index[0]))
+            cutoff, top = self.bounds(sub)
+            cutoff = np.array(np.broadcast_to(cutoff, len(sub)))
+            if credit is not None:
+                cutoff[v] = min(cutoff[v], credit + 1)
+        logging.debug("query lifts %d of %d vertices" % (len(sub), len(arena)))
+
+        with stats.phase('lifting'):
+            pm = np.zeros(len(sub), dtype=np.int64)
+            pm[losing_region(sub)] = top
+            self.lift(sub, pm, cutoff, top, stats, stop=v)
+        return -1 if pm[v] >= top else int(pm[v])
+
+    def lift_reduced(self, cutoff, top):
+        """
+        compute the progress measure on a game shrunk by
+        :func:`~egsolver.preprocess.reduce`.
+
+        Only the undecided part of the reduced game is lifted, with its own
+        cutoff and top: collapsed chains sum up effects, which may exceed
+        the largest effect of the game. The collapsed chains are filled in
+        afterwards by lifting just them, towards the final values of the
+        vertices they lead to.
+        """
+        arena, stats = self.arena, self.stats
+        with stats.phase('preprocess'):
+            pm, sub, keep, collapsed = reduce(arena, top)
+        logging.info("preprocessing left %d of %d vertices" % (
+            np.count_nonzero(sub.out_degree()), len(arena)))
+
+        with stats.phase('lifting'):
+            subcutoff, subtop = self.bounds(sub)
+            subpm = np.where(pm[keep] == top, subtop, pm[keep])
+            self.lift(sub, subpm, subcutoff, subtop, stats)
+            pm[keep] = np.where(subpm == subtop, top, subpm)
+
+            vs = np.flatnonzero(collapsed)
+            if len(vs):
+                chains, keep = arena.subarena(vs)
+                chainpm = pm[keep]
+                chaincutoff = np.broadcast_to(cutoff, len(arena))[keep]
+                self.lift(chains, chainpm, chaincutoff, top, stats)
+                pm[vs] = chainpm[:len(vs)]
+        return pm
+
+    def lift_components(self, pm, top):
+        """
+        lift `pm` one strongly connected component at a time.
+
+        Components are solved in reverse topological order. The measures of
+        components further down are final by then and act as constants, so
+        every component gets its own cutoff: the sum of its own maximal drops
+        plus the largest finite measure it can reach outside. Components at
+        the same level of the condensation do not depend on each other; large
+        ones among them are lifted by a pool of `workers` processes.
+        """
+        arena = self.arena
+        owner, effect = arena.owner, arena.effect
+        succ, succ_ptr = arena.succ, arena.succ_ptr
+        drop = arena.maxdrop()
+
+        comp, down_ptr, down = arena.condensation()
+        ncomp = len(down_ptr) - 1
+        members = np.argsort(comp, kind='stable')
+        members_ptr = np.zeros(ncomp + 1, dtype=np.int64)
+        np.cumsum(np.bincount(comp, minlength=ncomp), out=members_ptr[1:])
+
+        # components with a single vertex and no self-loop are trivial
+        inside = comp[arena.src] == comp[succ]
+        trivial = np.ones(ncomp, dtype=np.bool_)
+        trivial[comp[arena.src[inside]]] = False
+
+        # the level of a component is the length of the longest path
+        # down to a bottom component in the condensation
+        down, down_ptr = down.tolist(), down_ptr.tolist()
+        level = [0] * ncomp
+        for c in range(ncomp):
+            for d in down[down_ptr[c]:down_ptr[c + 1]]:
+                if level[d] >= level[c]:
+                    level[c] = level[d] + 1
+        level = np.array(level, dtype=np.int64)
+
+        stats = self.stats
+        pool = None
+        try:
+            for lvl in range(int(level.max()) + 1 if ncomp else 0):
+                here = level == lvl
+
+                # trivial components need a single lift, all at once
+                vs = members[members_ptr[np.flatnonzero(here & trivial)]]
+                vs = vs[succ_ptr[vs + 1] > succ_ptr[vs]]
+                if len(vs):
+                    edges, starts = segments(succ_ptr, vs)
+                    targets = pm[succ[edges]]
+                    demand = np.where(targets == top, top,
+                                      targets - effect[edges])
+                    nextval = np.maximum(0, np.where(
+                        owner[vs] == 0,
+                        np.minimum.reduceat(demand, starts),
+                        np.maximum.reduceat(demand, starts)))
+                    up = nextval > pm[vs]
+                    stats.count(len(vs), np.count_nonzero(up), len(vs))
+                    pm[vs] = nextval
+
+                # the others are lifted separately
+                tasks = []
+                for c in np.flatnonzero(here & ~trivial).tolist():
+                    vs = members[members_ptr[c]:members_ptr[c + 1]]
+                    sub, keep = arena.subarena(vs)
+                    below = pm[keep[len(vs):]]
+                    below = below[below < top]
+                    cutoff = int(drop[vs].sum()) + 1
+                    if len(below):
+                        cutoff += int(below.max())
+                    task = (self.lift, sub, pm[keep], len(vs), cutoff, top)
+                    if self.workers > 1 and len(vs) >= POOL_THRESHOLD:
+                        tasks.append((vs, task + (SolverStats(),)))
+                    else:
+                        pm[vs], _ = _lift_component(task + (stats,))
+
+                if tasks:
+                    if pool is None:
+                        pool = mp.Pool(self.workers)
+                    results = pool.map(_lift_component,
+                                       [task for _, task in tasks])
+                    for (vs, _), (result, counts) in zip(tasks, results):
+                        pm[vs] = result
+                        stats.merge(counts)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return pm
+
+
+class IncrementalSolver(ProgressMeasureSolver):
+    """
+    Progress measure solver for games that are edited between solves.
+
+    The measure of the previous call to :meth:`solve` is kept. An edit that
+    can only raise the least fixpoint (a lower effect, a new edge for player 1
+    or a removed edge of player 0) keeps it as the starting point for the
+    next solve, where lifting resumes at the vertices that became
+    inconsistent. Any other edit resets the measure of those vertices that can
+    reach the edited edge, since only their values can drop.
+    """
+
+    def __init__(self, eg, mode='worklist', stats=None):
+        # per-vertex cutoffs need the components afresh on every solve, which
+        # costs more than the few lifts after a small edit
+        ProgressMeasureSolver.__init__(self, eg, mode, stats=stats,
+                                       local_cutoffs=False)
+        self.index = self.arena.index()
+        self.pm = None
+        self.top = None
+
+    def initial_measure(self, cutoff, top):
+        if self.pm is None:
+            return ProgressMeasureSolver.initial_measure(self, cutoff, top)
+        pm = self.pm
+        pm[pm == self.top] = top
+        pm[pm >= cutoff] = top
+        return pm
+
+    def remember(self, pm, top):
+        self.pm, self.top = pm, top
+        return ProgressMeasureSolver.remember(self, pm, top)
+
+    def _edited(self, s, lowering):
+        """ update the kept measure after the out-edges of `s` changed """
+        if self.pm is None:
+            return
+        arena = self.arena
+        sink = arena.out_degree() == 0
+        if lowering:
+            region = arena.reachable([s], backward=True)
+            self.pm[region] = 0
+            self.pm[region & sink] = self.top
+        elif sink[s]:
+            self.pm[s] = self.top
+
+    def _synced_game(self):
+        """ the networkx game to keep in sync, if there is one """
+        return None if isinstance(self.game, Arena) else self.game
+
+    def update_effect(self, e, effect):
+        """ set the effect of the edge `e`, a pair of node ids """
+        s, t = self.index[e[0]], self.index[e[1]]
+        arena = self.arena
+        pos = arena.edge_index(s, t)
+        if not arena.effect.flags.writeable:
+            arena.effect = arena.effect.copy()
+        old = arena.effect[pos]
+        arena.effect[pos] = effect
+        if self._synced_game() is not None:
+            self.game.edges[e]['effect'] = effect
+        self._edited(s, lowering=effect > old)
+
+    def add_edge(self, src, trg, effect):
+        """
+        add an edge between two existing nodes; as in networkx, adding an
+        edge that exists already sets its effect
+        """
+        s, t = self.index[src], self.index[trg]
+        try:
+            self.arena.edge_index(s, t)
+        except KeyError:
+            pass
+        else:
+            return self.update_effect((src, trg), effect)
+        wasdead = self.arena.out_degree()[s] == 0
+        self.arena = self.arena.with_edge(s, t, effect)
+        if self._synced_game() is not None:
+            self.game.add_edge(src, trg, effect=effect)
+        else:
+            self.game = self.arena
+        self._edited(s, lowering=wasdead or self.arena.owner[s] == 0)
+
+    def remove_edge(self, src, trg):
+        """ remove the edge between two nodes """
+        s, t = self.index[src], self.index[trg]
+        self.arena = self.arena.without_edge(s, t)
+        if self._synced_game() is not None:
+            self.game.remove_edge(src, trg)
+        else:
+            self.game = self.arena
+        self._edited(s, lowering=self.arena.owner[s] == 1)
+
+
+def _thresholds(lo, hi, n):
+    """
+    the fractions with denominators of at most `n` to test between two
+    neighbours `lo` < `hi` in the Stern-Brocot tree, in increasing order.
 
-        # bitvector to remember set of states to reconsider
-        dirty = np.matrix([True] * n)
-
-        # initialize progress measure
-        # we'll use an integer vector with (initially empty) bitmask
-        pm = np.zeros(n, dtype=np.int).view(np.ma.MaskedArray)
-        for v in eg.nodes():  # sinks should be losing.
-            if not adj[v].any():
-                pm[v] = top   # mark them so
-                dirty[0, v] = False   # mark them as done
-
-        # define formatter used in logging
-        def set_str(bm):
-            return "{%s}" % ",".join({str(v) for v in eg.nodes() if bm[0, v]})
-        logging.debug("dirty: %s" % set_str(dirty))
-
-        # compute the new measure for state v
-        bestfor = {0: np.min, 1: np.max}  # player 0 is the minimizer
-
-        def lift(v):
-            # TODO: only do this for successors of v
-            lifts = (pm - weightmatrix[v])
-            logging.debug("lifts: %s" % lifts)
-            return bestfor[owner[v]](lifts)
-
-        # main loop
-        while dirty.any():
-            logging.debug("measure: %s" % pm)
-            logging.debug("dirty states: %s" % set_str(dirty))
-
-            v = dirty.argmax()   # pick some dirty state
-            dirty[0, v] = False   # mark it not dirty
-            logging.debug("considering state %d" % v)
-
-            # compute new measure and remember previous one for comparison
-            nextval = lift(v)
-            if (nextval >= cutoff) or (nextval is np.ma.masked):
-                nextval = top
-            logging.debug("the new value for state %d is %s" % (v, nextval))
-
-            # really update only on strict increases
-            if (nextval > pm[v]):
-                pm[v] = nextval
-
-                # mark predecessors dirty if there are any
-                preds = adj.T[v]
-                if preds.any():
-                    logging.debug("enqueue predecessors: %s" % set_str(preds))
-                    np.bitwise_or(dirty, preds, out=dirty)
-                    # TODO: don't enqueue sinks / stuff with value top
-
-        logging.debug("measure: %s" % pm)
-        # remember and return the progress measure = winning region
-
-        def top_as_minus_one(i):
-            return -1 if i == top else int(i)
-        self.win = {v: top_as_minus_one(pm[v]) for v in eg.nodes()}
+    These are the mediants along the two runs of the tree from the mediant
+    of `lo` and `hi` towards either end. Any two consecutive ones are
+    neighbours again, and nothing between `lo` or `hi` and the closest
+    of them has a denominator of at most `n`.
+    """
+    a, b, c, d = lo.numerator, lo.denominator, hi.numerator, hi.denominator
+    down = [Fraction(j * a + c, j * b + d) for j in range((n - d) // b, 0, -1)]
+    up = [Fraction(a + j * c, b + j * d) for j in range(2, (n - b) // d + 1)]
+    return down + up if down else []
+
+
+class MeanPayoffSolver(ProgressMeasureSolver):
+    """
+    Solver for mean-payoff games, where player 0 maximizes the long-run
+    average effect of a play and player 1 minimizes it.
+
+    Player 0 can guarantee a mean payoff of at least p/q from a vertex iff it
+    wins the energy game with all effects multiplied by q and lowered by p.
+    Values are fractions with denominators of at most n, the number of
+    vertices, so they are searched for in the Stern-Brocot tree, using only
+    thresholds of that kind: the measures of the energy games stay below
+    n^2 times the largest effect, rather than n^3 times for a search on a
+    grid fine enough to tell all values apart.
+
+    Every threshold is tested by a pair of energy games, one for either
+    player, which split the vertices under test into those with smaller
+    values, those with larger values and those that have the threshold as
+    their value. The first two are subgames with the same values, as in the
+    algorithm of Brim et al. (see :class:`ProgressMeasureSolver`), and are
+    searched separately. The measure at a threshold lies below the one at
+    any larger threshold, so the search above a threshold resumes lifting
+    from it rather than from zero, and below a threshold, so does the dual
+    game.
+
+    In :attr:`win`, nodes are mapped to their values as
+    :class:`fractions.Fraction`. In every set of vertices with the same
+    value, player 0 follows the energy game at exactly that value, which is
+    an optimal strategy. Games must not have sinks.
+    """
+
+    def __init__(self, eg, mode='worklist', stats=None):
+        ProgressMeasureSolver.__init__(self, eg, mode, stats=stats)
+        self.strategy = np.full(len(self.arena), -1, dtype=np.int64)
+
+    def energy(self, sub, threshold, pm=None, dual=False):
+        """
+        lift the progress measure of the subgame `sub` with its effects
+        lowered by `threshold` and multiplied by its denominator, starting
+        from `pm` or zero, and from top on the
+        :func:`~egsolver.preprocess.losing_region`. In the `dual` game, the
+        players swap roles and effects are negated, so that it is won from
+        the vertices with values of at most `threshold`.
+
+        Returns the energy game and its measure, where losing vertices are -1.
+        """
+        game = copy.copy(sub)
+        game.effect = (sub.effect * threshold.denominator
+                       - threshold.numerator)
+        if dual:
+            game.owner, game.effect = 1 - sub.owner, -game.effect
+        cutoff, top = self.bounds(game)
+        if pm is None:
+            pm = np.zeros(len(game), dtype=np.int64)
+        else:
+            pm = np.where(pm >= cutoff, top, pm)
+        pm[losing_region(game)] = top
+        self.lift(game, pm, cutoff, top, self.stats)
+        return game, np.where(pm == top, -1, pm)
+
+    def settle(self, vs, value, pm):
+        """
+        fix the value of the vertices `vs`, where player 0 plays by the
+        progress measure `pm` of the energy game at that value
+        """
+        within = np.zeros(len(self.arena), dtype=np.bool_)
+        within[vs] = True
+        sub, _ = self.arena.induced(within)
+        game = copy.copy(sub)
+        game.effect = sub.effect * value.denominator - value.numerator
+        opt = energy_strategy(game, pm)
+        self.strategy[vs] = np.where(opt >= 0, vs[opt], -1)
+        self.values[vs] = value
+
+    def solve(self):
+        arena = self.arena
+        n = len(arena)
+        if (arena.out_degree() == 0).any():
+            raise ValueError("mean-payoff games must not have sinks")
+        self.values = np.zeros(n, dtype=object)
+        self.strategy[:] = -1
+        if not n:
+            self.win = {}
+            return self.win
+
+        # measures of the energy games, rescaled to another threshold,
+        # must fit into 64 bits
+        lo, hi = int(arena.effect.min()), int(arena.effect.max())
+        if 2 * (n + 2) * n * n * max(-lo, hi, 1) >= 1 << 62:
+            raise ValueError("effects too large for exact mean-payoff values")
+
+        # every task is a set of vertices, whose values lie between the
+        # first and the last of a sorted sequence of candidates, with their
+        # measure at the first one and their dual measure at the last one.
+        # The measure is a progress measure and lies below the least one if
+        # `exact`; the dual one lies below the least one if given. Runs of
+        # the Stern-Brocot tree are searched from the mediant outwards, with
+        # steps that double towards the end given by the sign of `gallop`.
+        tasks = [(np.arange(n), range(lo, hi + 2),
+                  np.zeros(n, dtype=np.int64), True, None, 0)]
+        with self.stats.phase('lifting'):
+            while tasks:
+                vs, xs, pm, exact, dm, gallop = tasks.pop()
+                low, high = Fraction(xs[0]), Fraction(xs[-1])
+                if len(xs) == 2:
+                    # a value is the mean of a simple cycle among the
+                    # vertices of the same value, which are all in vs
+                    xs = [low] + _thresholds(low, high, len(vs)) + [high]
+                    if len(xs) == 2:
+                        self.settle(vs, low, pm)
+                        continue
+                    i = xs.index(Fraction(low.numerator + high.numerator,
+                                          low.denominator + high.denominator))
+                    below, beyond = -1, 1
+                elif gallop > 0:
+                    i = min(gallop, len(xs) - 2)
+                    below, beyond = 0, 2 * gallop
+                elif gallop < 0:
+                    i = max(1, len(xs) - 1 + gallop)
+                    below, beyond = 2 * gallop, 0
+                else:
+                    i = len(xs) // 2
+                    below = beyond = 0
+
+                within = np.zeros(n, dtype=np.bool_)
+                within[vs] = True
+                sub, _ = arena.induced(within)
+                t = Fraction(xs[i])
+                logging.debug("threshold %s on %d vertices" % (t, len(vs)))
+
+                # values of at most t, and of at least t; the measure at a
+                # lower threshold only helps those that stay finite, on the
+                # others lifting takes as many rounds to reach the cutoff but
+                # keeps more vertices busy
+                if dm is not None:
+                    dm = dm * t.denominator // high.denominator
+                _, dual = self.energy(sub, t, dm, dual=True)
+                under = dual >= 0
+                start = None
+                if exact:
+                    start = np.where(under, 0,
+                                     pm * t.denominator // low.denominator)
+                _, measure = self.energy(sub, t, start)
+                above = measure >= 0
+
+                # going down, the measure at t is not below the one of the
+                # smaller subgame any more, but the dual one is; going up,
+                # it is the other way round
+                at = above & under
+                if at.any():
+                    self.settle(vs[at], t, measure[at])
+                down, up = ~above, ~under
+                if down.any():
+                    tasks.append((vs[down], xs[:i + 1], pm[down], False,
+                                  dual[down], below))
+                if up.any():
+                    tasks.append((vs[up], xs[i:], measure[up], True, None,
+                                  beyond))
+
+        self.win = dict(zip(arena.nodes.tolist(), self.values.tolist()))
         return self.win
+
+    def strategy_array(self):
+        """ the optimal strategy of player 0 on all its vertices """
+        return self.strategy.copy()
+
+
+def _on_cycles(parent):
+    """
+    the vertices on cycles of the graph in which every vertex points to its
+    `parent`, or to nothing (-1), as a boolean mask: those that are reached
+    by following parents at least n times, which include a vertex of every
+    cycle
+    """
+    n = len(parent)
+    jump = np.append(parent, n)
+    jump[jump < 0] = n
+    steps = 1
+    while steps < n:
+        jump = jump[jump]
+        steps *= 2
+    ends = jump[:n]
+    cycles = np.zeros(n, dtype=np.bool_)
+    cycles[ends[ends < n]] = True
+    return cycles
+
+
+class StrategyImprovementSolver(Solver):
+    """
+    Solver that improves a strategy of player 0 until it is optimal.
+
+    A strategy is evaluated by the least credits that player 0 needs with
+    it against the best answers of player 1, see :meth:`evaluate`. Then
+    every vertex of player 0 with an edge that demands strictly less than
+    its credit is switched to its least demanding edge, which lowers the
+    credits, until no such edge is left. Every step costs polynomial time,
+    independent of the size of the effects, which makes this much faster
+    than lifting on games with large effects.
+
+    Credits are only sure to be least once no switch is left if no cycle
+    has weight zero, so all effects w are first scaled to (n+1)w+1, for n
+    vertices. This does not change the sign of any cycle, and the credits
+    of the game are those of the scaled one divided by n+1, rounded up.
+
+    Moreover, player 0 may give up at any of its vertices, for a credit
+    that no play which gives up can get below the cutoff with. All its
+    vertices start out giving up, so that their credits are finite, and
+    stay finite as they only get lower. Otherwise, a vertex whose strategy
+    leads into a losing cycle could not tell which of its edges lead out.
+    """
+
+    def __init__(self, eg, stats=None):
+        Solver.__init__(self, eg, stats)
+        self.iterations = 0
+
+    def evaluate(self, game, sigma, escape, bound, top):
+        """
+        the least credits that player 0 needs when it plays the edges
+        `sigma` (an edge per vertex of player 0, or -1 to give up for credit
+        `escape`) against the best answers of player 1, or top where it
+        loses.
+
+        These are longest paths with the negated effects as lengths in the
+        graph of the strategy, floored at zero, and computed by
+        Bellman-Ford over arrays, one round for all vertices that have to
+        be updated at a time. Whenever another n vertices were updated, the
+        graph of the last updates is searched for cycles, which have
+        negative weight; all vertices that can reach one lose, as do those
+        whose credits reach `bound`.
+        """
+        n, stats = len(game), self.stats
+        keep = game.owner[game.src] == 1
+        keep[sigma[sigma >= 0]] = True
+        ptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(game.src[keep], minlength=n), out=ptr[1:])
+        graph = EnergyArena(game.nodes, game.owner, ptr, game.succ[keep],
+                            game.effect[keep])
+        degree = graph.out_degree()
+
+        pm = np.where(degree > 0, 0, np.where(game.owner == 0, escape, top))
+        parent = np.full(n, -1, dtype=np.int64)
+        dirty = np.flatnonzero(degree > 0)
+        work = 0
+        while len(dirty):
+            edges, starts = segments(graph.succ_ptr, dirty)
+            demand = pm[graph.succ[edges]] - graph.effect[edges]
+            demand[demand >= bound] = top
+            best, first = _argbest(demand, starts, degree[dirty], np.maximum)
+            up = best > pm[dirty]
+            lifted = dirty[up]
+            pm[lifted] = best[up]
+            parent[lifted] = np.where(best[up] < top,
+                                      graph.succ[edges[first[up]]], -1)
+            stats.count(len(dirty), len(lifted), len(dirty))
+
+            preds, _ = segments(graph.pred_ptr, lifted)
+            dirty = np.unique(graph.pred[preds])
+            work += len(dirty)
+            if work >= n:
+                work = 0
+                cycles = _on_cycles(parent)
+                if cycles.any():
+                    lost = graph.reachable(np.flatnonzero(cycles),
+                                           backward=True)
+                    pm[lost] = top
+                    parent[lost] = -1
+            dirty = dirty[pm[dirty] < top]
+        return pm
+
+    def solve(self):
+        arena, stats = self.arena, self.stats
+        n = len(arena)
+
+        with stats.phase('cutoff'):
+            scale = n + 1
+            game = copy.copy(arena)
+            game.effect = arena.effect * scale + 1
+            maxinc = max(0, int(game.effect.max())) if len(game.effect) else 0
+            cutoff = game.cutoff()
+            # a play that gives up gains at most n * maxinc before, and
+            # credits under any strategy that gives up stay below bound
+            escape = cutoff + n * maxinc
+            bound = escape + cutoff
+            top = bound + maxinc
+            if top + int(np.abs(game.effect).max(initial=0)) >= 1 << 62:
+                raise ValueError("effects are too large to be scaled for "
+                                 "strategy improvement")
+
+        minimizer = np.flatnonzero((arena.owner == 0)
+                                   & (arena.out_degree() > 0))
+        edges, starts = segments(arena.succ_ptr, minimizer)
+        lens = arena.out_degree()[minimizer]
+        sigma = np.full(n, -1, dtype=np.int64)
+
+        while True:
+            with stats.phase('evaluation'):
+                pm = self.evaluate(game, sigma, escape, bound, top)
+            if not len(minimizer):
+                break
+            with stats.phase('improvement'):
+                demand = pm[game.succ[edges]] - game.effect[edges]
+                demand[demand >= bound] = top
+                best, first = _argbest(np.maximum(demand, 0), starts, lens,
+                                       np.minimum)
+                better = best < pm[minimizer]
+            if not better.any():
+                break
+            sigma[minimizer[better]] = edges[first[better]]
+            self.iterations += 1
+        logging.debug("%d improvements" % self.iterations)
+
+        self.values = np.where(pm < cutoff, -(-pm // scale), -1)
+        self.win = dict(zip(arena.nodes.tolist(), self.values.tolist()))
+        return self.win
+
+
+class ZielonkaSolver(Solver):
+    """
+    Solver for parity games that implements Zielonka's recursive algorithm.
+
+    The algorithm is described in
+        Infinite games on finitely coloured graphs with applications to
+        automata on infinite trees
+        Wieslaw Zielonka
+        Theoretical Computer Science 200 (1998) 135-183.
+        :doi:`10.1016/S0304-3975(98)00009-7`
+
+    It runs on a :class:`~egsolver.arenas.ParityArena`, where subgames are
+    boolean masks and attractors are computed a whole frontier at a time
+    (see :meth:`~egsolver.arenas.Arena.attractor`). The second recursive call
+    of every level is turned into a loop, so the recursion is only as deep
+    as the number of distinct priorities.
+
+    Winning follows the convention of pgsolver: player 0 wins a play if the
+    largest priority that occurs infinitely often is even, and a player who
+    cannot move loses. In :attr:`win`, vertices won by player 0 are mapped to
+    0 and those won by player 1 to -1.
+    """
+
+    def __init__(self, pg, stats=None):
+        if not isinstance(pg, Arena):
+            pg = ParityArena.from_parity_game(pg)
+        Solver.__init__(self, pg, stats)
+        n = len(self.arena)
+        self.winner = np.zeros(n, dtype=np.int8)
+        self.strategy = np.full(n, -1, dtype=np.int64)
+
+    def solve(self):
+        arena = self.arena
+        alive = np.ones(len(arena), dtype=np.bool_)
+
+        with self.stats.phase('solving'):
+            # players who cannot move lose
+            dead = arena.out_degree() == 0
+            for player in (1, 0):
+                stuck = dead & alive & (arena.owner == 1 - player)
+                won = arena.attractor(player, stuck, alive, self.strategy)
+                self.winner[won] = player
+                alive &= ~won
+            self.zielonka(alive)
+        self.values = np.where(self.winner == 0, 0, -1)
+        self.win = dict(zip(arena.nodes.tolist(), self.values.tolist()))
+        return self.win
+
+    def zielonka(self, alive):
+        """
+        decide the winner of all vertices in the subgame `alive`, in which
+        every vertex has a successor
+        """
+        arena = self.arena
+        priority, owner = arena.priority, arena.owner
+        alive = alive.copy()
+        while alive.any():
+            top = int(priority[alive].max())
+            player = top % 2
+            tops = alive & (priority == top)
+            attr = arena.attractor(player, tops, alive, self.strategy)
+            self.zielonka(alive & ~attr)
+
+            # did the opponent win anything in the rest?
+            lost = alive & ~attr & (self.winner != player)
+            if not lost.any():
+                # vertices of the player with top priority stay inside
+                mine = np.flatnonzero(tops & (owner == player))
+                edges, _ = segments(arena.succ_ptr, mine)
+                hit = np.flatnonzero(alive[arena.succ[edges]])
+                which = np.repeat(np.arange(len(mine)),
+                                  arena.out_degree()[mine])[hit]
+                which, first = np.unique(which, return_index=True)
+                self.strategy[mine[which]] = arena.succ[edges[hit[first]]]
+                self.winner[alive] = player
+                return
+
+            # the opponent wins everything it can attract to that
+            back = arena.attractor(1 - player, lost, alive, self.strategy)
+            self.winner[back] = 1 - player
+            alive &= ~back
+
+    def strategy_array(self):
+        """ the winning strategy of player 0 on its winning region """
+        opt = np.full(len(self.arena), -1, dtype=np.int64)
+        mine = (self.arena.owner == 0) & (self.winner == 0)
+        opt[mine] = self.strategy[mine]
+        return opt
+
+
+ENERGY_SOLVERS = {
+    'pm': ProgressMeasureSolver,
+    'si': StrategyImprovementSolver,
+}
+
+# the largest cutoff for which 'auto' still picks lifting
+AUTO_CUTOFF = 10000
+
+
+def choose_solver(arena):
+    """
+    the name of the solver in :data:`ENERGY_SOLVERS` that is likely faster
+    on an energy arena: lifting needs up to `cutoff` lifts per vertex, which
+    grows with the effects and the number of vertices, whereas strategy
+    improvement costs more per step but does not depend on the effects
+    """
+    cutoff = arena.cutoff()
+    # strategy improvement needs credits of about n^2 times the largest
+    # effect to fit into 64 bits
+    largest = int(np.abs(arena.effect).max(initial=0))
+    if cutoff <= AUTO_CUTOFF or (len(arena) + 1) ** 2 * largest >= 1 << 59:
+        return 'pm'
+    return 'si'
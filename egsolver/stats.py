@@ -0,0 +1,70 @@
+# Copyright (C) 2017  Patrick Totzke <patricktotzke@gmail.com>
+# This file is released under the GNU GPL, version 3 or a later revision.
+
+from contextlib import contextmanager
+from timeit import default_timer
+
+
+class SolverStats(object):
+    """
+    Counters and phase timings of a solver.
+
+    `lifts` counts how often the measure of a vertex was recomputed, whether
+    or not that changed it, `increases` how often that strictly raised it,
+    `enqueues` how often vertices were scheduled to be lifted, `saturations`
+    how many measures were raised to top and `hits` how many results were
+    found in a cache instead. Counts add up over all calls to `solve`.
+
+    If a `hook` is given, lifting engines call it with the stats about every
+    `every` lifts, with the counters brought up to date, to sample progress.
+    """
+    COUNTERS = ('lifts', 'increases', 'enqueues', 'saturations', 'hits')
+
+    def __init__(self, hook=None, every=10000):
+        self.hook = hook
+        self.every = every
+        self.timings = {}
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+
+    def count(self, lifts=0, increases=0, enqueues=0, saturations=0,
+              hits=0):
+        # engines pass numpy counts; keep plain ints so stats stay json-able
+        self.lifts += int(lifts)
+        self.increases += int(increases)
+        self.enqueues += int(enqueues)
+        self.saturations += int(saturations)
+        self.hits += int(hits)
+
+    def merge(self, other):
+        """ add the counters and timings of other stats to these """
+        self.count(*(getattr(other, name) for name in self.COUNTERS))
+        for name, seconds in other.timings.items():
+            self.timings[name] = self.timings.get(name, 0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        """ add the time spent in the `with` block to the phase `name` """
+        start = default_timer()
+        try:
+            yield self
+        finally:
+            elapsed = default_timer() - start
+            self.timings[name] = self.timings.get(name, 0) + elapsed
+
+    def sample(self):
+        if self.hook is not None:
+            self.hook(self)
+
+    def as_dict(self):
+        stats = {name: getattr(self, name) for name in self.COUNTERS}
+        stats['timings'] = dict(self.timings)
+        return stats
+
+    @classmethod
+    def from_dict(cls, stats):
+        """ the inverse of :meth:`as_dict` """
+        new = cls()
+        new.count(*(stats.get(name, 0) for name in cls.COUNTERS))
+        new.timings.update(stats['timings'])
+        return new
@@ -0,0 +1,125 @@
+# Copyright (C) 2017  Patrick Totzke <patricktotzke@gmail.com>
+# This file is released under the GNU GPL, version 3 or a later revision.
+"""
+Check claimed solutions of energy games without solving them again.
+
+A solution, as written by `egsolver solve -f json`, maps every node to the
+least initial credit with which player 0 wins from there (or -1 if it loses)
+and every winning node of player 0 to a successor. Both are checked with a
+constant number of vectorized passes over the edges:
+
+The credits are a certificate for the winning region if they form a
+progress measure on the graph restricted to the strategy: no edge of player
+1 and no strategy edge leaves the winning region, and none of them asks for
+more credit than its source has. Credits then act as potentials along which
+every cycle that player 1 can close is non-negative, so the strategy keeps
+the energy above the credits forever.
+
+Moreover, the credits must be a fixpoint of the lifting operator, with
+losing nodes lifted at least to the cutoff. This catches credits that are
+larger than their successors demand, but not claims that greater fixpoints
+satisfy as well, such as a winning cycle claimed to be losing.
+
+Such claims would need a strategy of player 1 to confirm. Instead, losing
+nodes are only confirmed if player 1 can keep the play among them and force
+it into a sink or a negative trap (see
+:func:`~egsolver.preprocess.losing_region`). The others are reported as
+unverified rather than wrong.
+"""
+
+import numpy as np
+
+from .arenas import Arena, EnergyArena, indexer
+from .preprocess import losing_region
+
+# number of offending nodes named in a message
+EXAMPLES = 5
+
+
+def _complain(problems, what, vs, nodes):
+    if len(vs):
+        problems.append("%d nodes %s, e.g. %s" % (
+            len(vs), what, ", ".join(map(str, nodes[vs[:EXAMPLES]]))))
+
+
+def verify(game, win, opt):
+    """
+    check that `win`, a dict from nodes to credits (-1 for losing), and
+    `opt`, a dict from the winning nodes of player 0 to successors, solve
+    the energy game `game`.
+
+    :returns: a pair of lists of messages, one per violated condition and
+        one about losing claims that could not be confirmed
+    """
+    arena = game if isinstance(game, Arena) else \
+        EnergyArena.from_energy_game(game)
+    n, nodes = len(arena), arena.nodes
+    index_of = indexer(nodes)
+    problems = []
+
+    # the claims as arrays over vertex indices
+    values = np.full(n, -2, dtype=np.int64)
+    strategy = np.full(n, -1, dtype=np.int64)
+    try:
+        if win:
+            values[index_of(list(map(int, win)))] = list(win.values())
+        if opt:
+            strategy[index_of(list(map(int, opt)))] = index_of(
+                list(opt.values()))
+    except ValueError as e:
+        return ["the claims do not fit the game: %s" % e], []
+    _complain(problems, "have no credit", np.flatnonzero(values == -2), nodes)
+    _complain(problems, "have invalid credits",
+              np.flatnonzero(values < -2), nodes)
+    if problems:
+        return problems, []
+
+    losing = values < 0
+    sinks = arena.out_degree() == 0
+    _complain(problems, "are sinks but claimed winning",
+              np.flatnonzero(sinks & ~losing), nodes)
+
+    # what every edge demands of its source, where losing targets demand
+    # more than any credit
+    unbounded = np.iinfo(np.int64).max
+    demand = np.maximum(0, values[arena.succ] - arena.effect)
+    demand[losing[arena.succ]] = unbounded
+    src = arena.src
+    covered = ~losing[src] & (demand <= values[src])
+
+    # the winning region is closed under player 1's edges and the strategy,
+    # and credits cover their demands
+    player1 = (arena.owner[src] == 1) & ~losing[src]
+    _complain(problems, "of player 1 have edges their credit does not cover",
+              np.unique(src[player1 & ~covered]), nodes)
+    chosen = (arena.owner[src] == 0) & (arena.succ == strategy[src])
+    good = np.bincount(src[chosen & covered], minlength=n) > 0
+    needy = (arena.owner == 0) & ~losing & ~sinks
+    _complain(problems, "of player 0 have no strategy edge that their credit "
+                        "covers", np.flatnonzero(needy & ~good), nodes)
+
+    # the credits are a fixpoint of the lifting operator
+    lifted = np.full(n, unbounded, dtype=np.int64)
+    vs = np.flatnonzero(~sinks)
+    if len(vs):
+        starts = arena.succ_ptr[vs]
+        lifted[vs] = np.where(arena.owner[vs] == 0,
+                              np.minimum.reduceat(demand, starts),
+                              np.maximum.reduceat(demand, starts))
+    cutoff = arena.cutoff()
+    _complain(problems, "have credits above what their successors demand",
+              np.flatnonzero(~losing & ~sinks & (lifted < values)), nodes)
+    _complain(problems, "are claimed losing but their successors demand "
+                        "a bounded credit",
+              np.flatnonzero(losing & ~sinks & (lifted < cutoff)), nodes)
+
+    # player 1 keeps the play in the greatest trap for player 0 among the
+    # losing claims, where the obviously losing vertices are confirmed
+    trap = ~arena.attractor(0, ~losing)
+    sub, vs = arena.induced(trap)
+    confirmed = np.zeros(n, dtype=np.bool_)
+    confirmed[vs[losing_region(sub)]] = True
+    unverified = []
+    _complain(unverified, "are claimed losing but could not be confirmed",
+              np.flatnonzero(losing & ~confirmed), nodes)
+    return problems, unverified
@@ -0,0 +1,110 @@
+"""
+Brute-force solutions of tiny games to check the solvers against.
+
+All of these games are determined with positional strategies for both
+players, so it suffices to try every pair of positional strategies and to
+follow the single play that they leave from every vertex.
+"""
+
+import itertools
+from fractions import Fraction
+
+# games with more pairs of positional strategies are too big to try
+MAX_PROFILES = 4096
+
+LOSING = -1
+
+
+def profiles(arena):
+    """ the number of pairs of positional strategies of the two players """
+    count = 1
+    for d in arena.out_degree().tolist():
+        count *= max(d, 1)
+    return count
+
+
+def _strategies(arena, player):
+    """ all positional strategies of `player`, as dicts to edge indices """
+    ptr = arena.succ_ptr.tolist()
+    mine = [v for v in range(len(arena))
+            if arena.owner[v] == player and ptr[v] < ptr[v + 1]]
+    for edges in itertools.product(*(range(ptr[v], ptr[v + 1])
+                                     for v in mine)):
+        yield dict(zip(mine, edges))
+
+
+def _play(arena, sigma, tau, v):
+    """
+    the play from `v`: a pair of the edges before the cycle and those on it,
+    or the sink it ends in
+    """
+    seen, edges = {}, []
+    while v not in seen:
+        seen[v] = len(edges)
+        e = sigma.get(v, tau.get(v))
+        if e is None:
+            return v
+        edges.append(e)
+        v = int(arena.succ[e])
+    return edges[:seen[v]], edges[seen[v]:]
+
+
+def _best(arena, outcome, better0, better1):
+    """
+    the outcome from every vertex if player 0 picks its strategy first and
+    player 1 answers it, where `better0` and `better1` say which of two
+    outcomes a player prefers
+    """
+    n = len(arena)
+    answers = list(_strategies(arena, 1))
+    best = [None] * n
+    for sigma in _strategies(arena, 0):
+        worst = [None] * n
+        for tau in answers:
+            for v in range(n):
+                x = outcome(_play(arena, sigma, tau, v))
+                if worst[v] is None or better1(x, worst[v]):
+                    worst[v] = x
+        for v in range(n):
+            if best[v] is None or better0(worst[v], best[v]):
+                best[v] = worst[v]
+    return dict(zip(arena.nodes.tolist(), best))
+
+
+def energy_values(arena):
+    """ the least initial credits of player 0, or -1 where it loses """
+    def credit(play):
+        if not isinstance(play, tuple):
+            return float('inf')
+        prefix, cycle = play
+        effects = arena.effect[prefix + cycle].tolist()
+        if sum(effects[len(prefix):]) < 0:
+            return float('inf')
+        return max([0] + [-s for s in itertools.accumulate(effects)])
+
+    values = _best(arena, credit, lambda x, y: x < y, lambda x, y: x > y)
+    return {v: LOSING if c == float('inf') else c for v, c in values.items()}
+
+
+def mean_payoff_values(arena):
+    """ the mean payoffs that player 0 can ensure, in a game without sinks """
+    def mean(play):
+        _, cycle = play
+        return Fraction(int(arena.effect[cycle].sum()), len(cycle))
+
+    return _best(arena, mean, lambda x, y: x > y, lambda x, y: x < y)
+
+
+def parity_winners(arena):
+    """
+    0 where player 0 wins the parity game (largest priority seen infinitely
+    often even, players who cannot move lose) and -1 elsewhere
+    """
+    def winner(play):
+        if not isinstance(play, tuple):
+            return 0 if arena.owner[play] == 1 else LOSING
+        _, cycle = play
+        top = int(arena.priority[arena.src[cycle]].max())
+        return 0 if top % 2 == 0 else LOSING
+
+    return _best(arena, winner, lambda x, y: x > y, lambda x, y: x < y)
@@ -0,0 +1,23 @@
+from egsolver.bench import compare
+
+ROW = {'solver': 'worklist', 'n': 10, 'd': 0.5, 'o': 0.5, 'e': 10,
+       'seed': 0, 'nodes': 10, 'edges': 50, 'time': 1.0, 'lifts': 30,
+       'increases': 20, 'rss': 1000}
+
+
+def test_same_counts_pass():
+    assert compare([ROW], [ROW]) == []
+
+
+def test_more_lifts_regress():
+    assert compare([dict(ROW, lifts=31)], [ROW])
+
+
+def test_more_increases_regress():
+    assert compare([dict(ROW, increases=21)], [ROW])
+
+
+def test_counts_of_parallel_runs_vary():
+    row = dict(ROW, solver='parallel')
+    assert compare([dict(row, lifts=45)], [row]) == []
+    assert compare([dict(row, time=2.0)], [row])
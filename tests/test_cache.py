@@ -0,0 +1,36 @@
+from egsolver.cache import CachedSolver, ResultCache, game_key
+from egsolver.generators import random_energy_arena
+from egsolver.solvers import ProgressMeasureSolver
+
+
+def test_hit_gives_the_same_result(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    arena = random_energy_arena(30, 0.1, 0.5, 10, -10, False, 1)
+    first = CachedSolver(arena, cache)
+    first.solve()
+    assert first.stats.hits == 0
+    second = CachedSolver(arena, cache)
+    assert second.solve() == first.win == ProgressMeasureSolver(arena).solve()
+    assert second.optimal_strategy() == first.optimal_strategy()
+
+
+def test_hit_does_not_count_old_lifts(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    arena = random_energy_arena(30, 0.1, 0.5, 10, -10, False, 1)
+    first = CachedSolver(arena, cache)
+    first.solve()
+    second = CachedSolver(arena, cache)
+    second.solve()
+    assert second.stats.hits == 1
+    assert second.stats.lifts == 0
+    assert 'lifting' not in second.stats.timings
+    assert second.cached_stats.lifts == first.stats.lifts > 0
+
+
+def test_key_ignores_order():
+    arena = random_energy_arena(20, 0.2, 0.5, 10, -10, False, 2)
+    again = type(arena).from_edges(
+        arena.nodes[::-1], arena.owner[::-1],
+        arena.nodes[arena.src][::-1], arena.nodes[arena.succ][::-1],
+        arena.effect[::-1])
+    assert game_key(arena) == game_key(again)
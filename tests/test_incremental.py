@@ -0,0 +1,34 @@
+from egsolver.games import EnergyGame
+from egsolver.solvers import IncrementalSolver, ProgressMeasureSolver
+
+
+def two_nodes():
+    game = EnergyGame()
+    game.add_node(0, owner=0)
+    game.add_node(1, owner=0)
+    game.add_edge(0, 1, effect=0)
+    game.add_edge(1, 1, effect=0)
+    return game
+
+
+def fresh(game):
+    return ProgressMeasureSolver(game.copy()).solve()
+
+
+def test_add_existing_edge_sets_its_effect():
+    game = two_nodes()
+    solver = IncrementalSolver(game)
+    solver.solve()
+    solver.add_edge(0, 1, -5)
+    assert solver.arena.number_of_edges() == 2
+    assert solver.solve() == fresh(game) == {0: 5, 1: 0}
+
+
+def test_remove_edge_after_adding_it_again():
+    game = two_nodes()
+    solver = IncrementalSolver(game)
+    solver.solve()
+    solver.add_edge(0, 1, -5)
+    solver.solve()
+    solver.remove_edge(0, 1)
+    assert solver.solve() == fresh(game) == {0: -1, 1: 0}
@@ -0,0 +1,44 @@
+import pytest
+
+from egsolver.formatters import write_game_eg
+from egsolver.generators import random_energy_arena
+from egsolver.main import COMMANDS, build_parser
+
+
+def run(*argv):
+    args = build_parser().parse_args(list(argv))
+    try:
+        COMMANDS[args.cmd](args)
+    finally:
+        args.infile.close()
+        args.outfile.close()
+
+
+@pytest.fixture
+def game(tmp_path):
+    path = tmp_path / 'game.eg'
+    with open(str(path), 'w') as out:
+        write_game_eg(random_energy_arena(10, 0.3, 0.5, 10, -10, False, 0),
+                      out)
+    return str(path)
+
+
+def dot_nodes(path):
+    """ the lines of the nodes in a dot file, checking that it has edges """
+    lines = path.read_text().splitlines()
+    assert lines[0] == 'digraph G {' and lines[-1] == '}'
+    assert any('->' in line for line in lines)
+    return [line for line in lines[1:-1] if '->' not in line]
+
+
+def test_solve_as_dot(game, tmp_path):
+    out = tmp_path / 'win.dot'
+    run('solve', game, str(out), '-f', 'dot')
+    assert len(dot_nodes(out)) == 10
+
+
+@pytest.mark.parametrize('gametype', ['energy', 'parity'])
+def test_convert_to_dot(game, tmp_path, gametype):
+    out = tmp_path / 'game.dot'
+    run('convert', game, str(out), '-f', 'dot', '-t', gametype)
+    assert len(dot_nodes(out)) >= 10
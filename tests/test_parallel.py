@@ -0,0 +1,26 @@
+from egsolver.arenas import EnergyArena
+from egsolver.generators import random_energy_arena
+from egsolver.solvers import ProgressMeasureSolver
+
+
+def empty_arena():
+    return EnergyArena([], [], [0], [], [])
+
+
+def test_empty_game():
+    assert ProgressMeasureSolver(empty_arena(), workers=2).solve() == {}
+
+
+def test_agrees_with_one_process():
+    for seed in range(3):
+        arena = random_energy_arena(40, 0.1, 0.5, 10, -10, False, seed)
+        expected = ProgressMeasureSolver(arena).solve()
+        assert ProgressMeasureSolver(arena, workers=2).solve() == expected
+
+
+def test_agrees_with_one_process_on_a_large_game():
+    # large enough that workers mark each other's flags while scanning them
+    arena = random_energy_arena(3000, 0.002, 0.5, 10, -10, True, 5)
+    expected = ProgressMeasureSolver(arena).solve()
+    for _ in range(2):
+        assert ProgressMeasureSolver(arena, workers=2).solve() == expected
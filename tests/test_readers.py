@@ -0,0 +1,80 @@
+import io
+
+import numpy as np
+import pytest
+
+from egsolver.arenas import EnergyArena, ParityArena
+from egsolver.formatters import write_game_eg, write_game_egb, write_pgsolver
+from egsolver.generators import random_energy_arena
+from egsolver.readers import read_egb, read_eg_stream, read_game
+
+
+def arenas():
+    yield EnergyArena([], [], [0], [], [])
+    for seed in range(5):
+        yield random_energy_arena(50, 0.1, 0.5, 10, -10, False, seed)
+
+
+def same(arena, other):
+    """ whether two arenas have the same vertices and edges, in order """
+    names = ('nodes', 'owner', 'succ_ptr', 'succ', 'effect')
+    return all((getattr(arena, name) == getattr(other, name)).all()
+               for name in names)
+
+
+def test_eg_round_trip():
+    for arena in arenas():
+        out = io.StringIO()
+        write_game_eg(arena, out)
+        assert same(read_eg_stream(io.StringIO(out.getvalue())), arena)
+
+
+def test_eg_merges_repeated_edges():
+    text = ('{"nodes": [{"id": 0, "owner": 0}, {"id": 1, "owner": 1}], '
+            '"edges": [{"source": 0, "target": 1, "effect": 1}, '
+            '{"source": 1, "target": 0, "effect": 2}, '
+            '{"source": 0, "target": 1, "effect": -3}]}')
+    arena = read_eg_stream(io.StringIO(text))
+    assert arena.succ.tolist() == [1, 0]
+    assert arena.effect.tolist() == [-3, 2]
+
+
+@pytest.mark.parametrize('node', ['"a"', '1.5', str(1 << 64)])
+def test_eg_rejects_ids_that_are_not_integers(node):
+    text = '{"nodes": [{"id": %s, "owner": 0}], "edges": []}' % node
+    with pytest.raises(ValueError, match=node.strip('"')):
+        read_eg_stream(io.StringIO(text))
+
+
+def test_egb_round_trip(tmp_path):
+    for arena in arenas():
+        out = io.BytesIO()
+        write_game_egb(arena, out)
+        assert same(read_egb(out.getvalue()), arena)
+
+        path = tmp_path / 'game.egb'
+        path.write_bytes(out.getvalue())
+        with open(str(path)) as infile:
+            assert same(read_game(infile), arena)
+
+
+def test_egb_truncated():
+    out = io.BytesIO()
+    write_game_egb(random_energy_arena(10, 0.5, 0.5, 10, -10, False, 0), out)
+    with pytest.raises(ValueError):
+        read_egb(out.getvalue()[:-8])
+
+
+def test_pgsolver_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    arena = random_energy_arena(50, 0.1, 0.5, 10, -10, True, 0)
+    game = ParityArena(arena.nodes, arena.owner, arena.succ_ptr, arena.succ,
+                       rng.integers(0, 5, len(arena)))
+    path = tmp_path / 'game.pg'
+    with open(str(path), 'w') as out:
+        write_pgsolver(game, out)
+    with open(str(path)) as infile:
+        again = read_game(infile)
+    assert again.objective == 'parity'
+    for name in ('nodes', 'owner', 'priority', 'succ_ptr', 'succ'):
+        assert (getattr(again, name) == getattr(game, name)).all()
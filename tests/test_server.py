@@ -0,0 +1,41 @@
+import io
+import json
+import threading
+
+from egsolver.formatters import write_game_eg
+from egsolver.generators import random_energy_arena
+from egsolver.main import build_parser
+from egsolver.server import Server, request
+from egsolver.solvers import ProgressMeasureSolver
+
+
+def options(*argv):
+    args = build_parser().parse_args(['solve'] + list(argv))
+    local = ('cmd', 'infile', 'outfile', 'logfile', 'verbose', 'connect')
+    return {k: v for k, v in vars(args).items() if k not in local}
+
+
+def test_solve_and_errors(tmp_path):
+    path = str(tmp_path / 'egsolver.sock')
+    arena = random_energy_arena(30, 0.1, 0.5, 10, -10, False, 0)
+    game = io.StringIO()
+    write_game_eg(arena, game)
+    payload = game.getvalue().encode('utf-8')
+
+    with Server(path, workers=1) as server:
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            error, output = request(path, 'solve', options('-f', 'json'),
+                                    payload)
+            assert error is None
+            win = {int(v): c for v, c in json.loads(output)['win'].items()}
+            assert win == ProgressMeasureSolver(arena).solve()
+
+            error, _ = request(path, 'solve', options('-w', '2'), payload)
+            assert error == "served solves use a single process"
+            error, _ = request(path, 'bench', {}, b'')
+            assert error == "cannot serve command 'bench'"
+        finally:
+            server.shutdown()
+            thread.join()
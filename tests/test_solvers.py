@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from egsolver.arenas import EnergyArena, ParityArena
+from egsolver.cache import CachedSolver, ResultCache
+from egsolver.games import EnergyGame
+from egsolver.generators import random_energy_arena
+from egsolver.solvers import (ENERGY_SOLVERS, IncrementalSolver,
+                              MeanPayoffSolver, ProgressMeasureSolver,
+                              StrategyImprovementSolver, ZielonkaSolver,
+                              choose_solver)
+from egsolver.verify import verify
+
+import reference
+
+
+def tiny_games(count, nosinks=False, maxeffect=4, mineffect=-3):
+    """ random games small enough for the brute-force reference """
+    games, seed = [], 0
+    while len(games) < count:
+        n = 1 + seed % 7
+        d = (0.3, 0.5, 0.7)[seed % 3]
+        arena = random_energy_arena(n, d, 0.5, maxeffect, mineffect,
+                                    nosinks or seed % 2 == 1, seed)
+        if reference.profiles(arena) <= reference.MAX_PROFILES:
+            games.append(arena)
+        seed += 1
+    return games
+
+
+GAMES = tiny_games(100)
+EMPTY = EnergyArena([], [], [0], [], [])
+
+ENERGY_CONFIGS = {
+    'worklist': lambda g, tmp: ProgressMeasureSolver(g),
+    'jacobi': lambda g, tmp: ProgressMeasureSolver(g, mode='jacobi'),
+    'global cutoff': lambda g, tmp: ProgressMeasureSolver(
+        g, local_cutoffs=False),
+    'scc': lambda g, tmp: ProgressMeasureSolver(g, scc=True),
+    'scc jacobi': lambda g, tmp: ProgressMeasureSolver(g, mode='jacobi',
+                                                       scc=True),
+    'preprocess': lambda g, tmp: ProgressMeasureSolver(g, preprocess=True),
+    'parallel': lambda g, tmp: ProgressMeasureSolver(g, workers=2),
+    'incremental': lambda g, tmp: IncrementalSolver(g),
+    'si': lambda g, tmp: StrategyImprovementSolver(g),
+    'cached': lambda g, tmp: CachedSolver(g, ResultCache(str(tmp))),
+    'cached si': lambda g, tmp: CachedSolver(
+        g, ResultCache(str(tmp)), solver=StrategyImprovementSolver),
+}
+
+
+@pytest.mark.parametrize('config', sorted(ENERGY_CONFIGS))
+def test_energy_solvers_agree_with_brute_force(config, tmp_path):
+    for arena in GAMES:
+        solver = ENERGY_CONFIGS[config](arena, tmp_path)
+        assert solver.solve() == reference.energy_values(arena)
+        problems, _ = verify(arena, solver.win, solver.optimal_strategy())
+        assert problems == []
+
+
+@pytest.mark.parametrize('config', sorted(ENERGY_CONFIGS))
+def test_energy_solvers_on_empty_game(config, tmp_path):
+    solver = ENERGY_CONFIGS[config](EMPTY, tmp_path)
+    assert solver.solve() == {}
+    assert solver.optimal_strategy() == {}
+
+
+def test_preprocess_with_chains_above_the_largest_effect():
+    # 1, 2, 3 collapse into one edge of effect 40, into a losing cycle
+    game = EnergyGame()
+    for v, owner in enumerate([1, 0, 0, 0, 1, 0, 0]):
+        game.add_node(v, owner=owner)
+    for u, v, effect in [(0, 0, 0), (0, 1, 10), (1, 2, 10), (2, 3, 10),
+                         (3, 4, 10), (4, 5, -2), (5, 4, 1), (5, 6, 1),
+                         (6, 4, -1)]:
+        game.add_edge(u, v, effect=effect)
+    arena = EnergyArena.from_energy_game(game)
+    solver = ProgressMeasureSolver(arena, preprocess=True)
+    assert solver.solve() == reference.energy_values(arena)
+
+
+def test_queries_agree_with_brute_force():
+    for arena in GAMES[:20]:
+        values = reference.energy_values(arena)
+        solver = ProgressMeasureSolver(arena)
+        for node, value in values.items():
+            assert solver.query(node) == value
+            if value > 0:
+                assert solver.query(node, value) == value
+                assert solver.query(node, value - 1) == -1
+
+
+def test_auto_picks_a_solver():
+    for arena in GAMES[:5] + [EMPTY]:
+        assert choose_solver(arena) in ENERGY_SOLVERS
+
+
+def test_mean_payoff_agrees_with_brute_force():
+    for arena in tiny_games(20, nosinks=True):
+        assert MeanPayoffSolver(arena).solve() == \
+            reference.mean_payoff_values(arena)
+
+
+def test_zielonka_agrees_with_brute_force():
+    rng = np.random.default_rng(0)
+    for arena in GAMES:
+        game = ParityArena(arena.nodes, arena.owner, arena.succ_ptr,
+                           arena.succ, rng.integers(0, 4, len(arena)))
+        assert ZielonkaSolver(game).solve() == reference.parity_winners(game)
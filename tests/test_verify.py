@@ -0,0 +1,41 @@
+from egsolver.games import EnergyGame
+from egsolver.generators import random_energy_arena
+from egsolver.solvers import ProgressMeasureSolver
+from egsolver.verify import verify
+
+
+def cycle(effect):
+    """ two nodes of player 0 on a cycle with the given effects """
+    game = EnergyGame()
+    game.add_node(0, owner=0)
+    game.add_node(1, owner=0)
+    game.add_edge(0, 1, effect=effect[0])
+    game.add_edge(1, 0, effect=effect[1])
+    return game
+
+
+def test_solutions_check_out():
+    for seed in range(20):
+        arena = random_energy_arena(30, 0.1, 0.5, 10, -10, seed % 2, seed)
+        solver = ProgressMeasureSolver(arena)
+        solver.solve()
+        problems, _ = verify(arena, solver.win, solver.optimal_strategy())
+        assert problems == []
+
+
+def test_wrong_credit_is_found():
+    game = cycle((-3, 3))
+    problems, _ = verify(game, {0: 2, 1: 0}, {0: 1, 1: 0})
+    assert problems
+
+
+def test_all_losing_claim_is_unverified():
+    game = cycle((0, 0))
+    problems, unverified = verify(game, {0: -1, 1: -1}, {})
+    assert problems == []
+    assert unverified
+
+
+def test_negative_cycle_is_confirmed_losing():
+    game = cycle((-1, -2))
+    assert verify(game, {0: -1, 1: -1}, {}) == ([], [])